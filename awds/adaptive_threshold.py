@@ -1,6 +1,7 @@
 from math import floor, ceil
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 
 class AdaptiveThreshold:
@@ -16,6 +17,14 @@ class AdaptiveThreshold:
     ca = 2 * N * ((theorical_pfa ** (-1 / (2 * N))) - 1)
     stride = 1
     window = 2 * (N + G) + 1
+    # rules to fuse the detections of several components
+    FUSION_RULES = ('any', 'majority', 'sum')
+
+    def __init__(self, dtype=None):
+        """
+        Params
+            dtype: floating type of the correlations and thresholds (e.g. np.float32), None keeps the input one"""
+        self.dtype = None if dtype is None else np.dtype(dtype)
 
     def ca_cfar(self, corr):
         """Cell Averaging Constant False Alarm Rate (CFAR)
@@ -29,9 +38,9 @@ class AdaptiveThreshold:
             detector: adaptive threshold
         """
         N, G, pfa = self.N, self.G, self.theorical_pfa
-        threshold = lambda w: self.ca * (((w[:N] ** 2).sum() + (w[N + 2 * G + 1:] ** 2).sum()) / (2 * N))
         windows = self.rolling(corr, self.window)
-        detector = np.array(list(map(threshold, windows)))
+        detector = self.ca * (((windows[..., :N] ** 2).sum(axis=-1) +
+                               (windows[..., N + 2 * G + 1:] ** 2).sum(axis=-1)) / (2 * N))
         return detector
 
     def os_cfar(self, corr):
@@ -47,9 +56,8 @@ class AdaptiveThreshold:
             detector: adaptive threshold"""
         N, G, pfa = self.N, self.G, self.theorical_pfa
         k = N - 1
-        threshold = lambda w: self.ca * ((np.sort(np.concatenate((w[:N], w[N + 2 * G + 1:])))[k]) ** 2)
         windows = self.rolling(corr, self.window)
-        detector = np.array(list(map(threshold, windows)))
+        detector = self.ca * (self.noise_cells(windows)[..., k] ** 2)
         return detector
 
     def tm_cfar(self, corr):
@@ -65,13 +73,15 @@ class AdaptiveThreshold:
         Return
             detector: adaptive threshold"""
         N, G, pfa, T1, T2 = self.N, self.G, self.theorical_pfa, self.T1, self.T2
-        threshold = lambda w: self.ca * (
-                (np.sort(np.concatenate((w[:N], w[N + 2 * G + 1:])))[T1:2 * N - T2]) ** 2).sum() / (
-                                      2 * N - (T2 + T1))
         windows = self.rolling(corr, self.window)
-        detector = np.array(list(map(threshold, windows)))
+        detector = self.ca * (self.noise_cells(windows)[..., T1:2 * N - T2] ** 2).sum(axis=-1) / (2 * N - (T2 + T1))
         return detector
 
+    def noise_cells(self, windows):
+        """Sorted noise cells (guard cells and CUT excluded) of each window"""
+        N, G = self.N, self.G
+        return np.sort(np.concatenate((windows[..., :N], windows[..., N + 2 * G + 1:]), axis=-1), axis=-1)
+
     def fusion_cfar(self, corr):
         """Apply the fusion CFAR algorithm on the pulses obtainde from the cfar techniques
         Params
@@ -101,9 +111,10 @@ class AdaptiveThreshold:
             pulses: cfar detector decisions"""
 
         global pulses
+        if self.dtype is not None:
+            corr = np.asarray(corr, dtype=self.dtype)
         corr_sqrt = corr ** 2
-        get_pulse = lambda detector: np.array(
-            [True if sig > thres else False for sig, thres in zip(corr_sqrt, detector)])
+        get_pulse = lambda detector: corr_sqrt > detector
         if cfar == 'ca_cfar':
             pulses = get_pulse(self.ca_cfar(corr))
         if cfar == 'os_cfar':
@@ -113,10 +124,29 @@ class AdaptiveThreshold:
         if cfar == 'fusion_cfar':
             pulses = self.fusion_cfar(corr)
 
-        pulses[0], pulses[-1] = False, False
+        pulses[..., 0], pulses[..., -1] = False, False
 
         return pulses
 
+    def fuse_channels(self, corr, pulses, rule='majority'):
+        """Fuse the detections of the components of a stacked (channel, time) correlation
+        Params
+            corr: (channel, time) correlations
+            pulses: (channel, time) cfar detector decisions, not used by 'sum'
+            rule: 'any' (one component), 'majority' (more than half of the components) or 'sum' (cfar on the
+                  summed correlation)
+        Return
+            corr: summed correlation, the fused score
+            pulses: fused decisions"""
+        if rule not in self.FUSION_RULES:
+            raise ValueError(f"rule must be one of {list(self.FUSION_RULES)}, got {rule}")
+        score = corr.sum(axis=0)
+        if rule == 'any':
+            return score, pulses.any(axis=0)
+        if rule == 'majority':
+            return score, 2 * pulses.sum(axis=0) > pulses.shape[0]
+        return score, self.detection_pulse(score, 'fusion_cfar')
+
     @staticmethod
     def diff(signal, window):
         """Derivate the signal based on the dt=window
@@ -126,23 +156,19 @@ class AdaptiveThreshold:
         Return
             first derivative of the signal"""
         windows = AdaptiveThreshold.rolling(signal, window)
-        z = lambda w: (w[int(window / 2):].mean() - w[:int(window / 2)].mean())
-        return np.array(list(map(z, windows)))
+        return windows[..., int(window / 2):].mean(axis=-1) - windows[..., :int(window / 2)].mean(axis=-1)
 
     @staticmethod
     def rolling(signal, window):
-        """Return a rolling window of the signal
+        """Return a rolling window of the signal, along the last axis
         Params
-            signal: signal to be rolled
+            signal: signal to be rolled, (..., time)
             window: window size
         Return
-            roll: windows"""
+            roll: windows, (..., time, window) read-only view on the padded signal"""
 
         pad_size = window - 1
-        padded_signal = np.concatenate((np.full(ceil(pad_size / 2), signal[0]), signal))
-        padded_signal = np.concatenate((padded_signal, np.full(floor(pad_size / 2), signal[-1])))
-        roll = []
-        for ix in range(0, len(padded_signal) - window + 1):
-            roll.append(padded_signal[ix:ix + window])
-
-        return np.array(roll)
+        signal = np.asarray(signal)
+        padded_signal = np.concatenate((np.repeat(signal[..., :1], ceil(pad_size / 2), axis=-1), signal,
+                                        np.repeat(signal[..., -1:], floor(pad_size / 2), axis=-1)), axis=-1)
+        return sliding_window_view(padded_signal, window, axis=-1)
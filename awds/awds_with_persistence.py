@@ -1,12 +1,12 @@
 import os
-from itertools import chain
 
 import numpy as np
 
 from awds.adaptive_threshold import AdaptiveThreshold
 from awds.detector import Detector
+from awds.efd import EFD
 from awds.reader import ReaderInterface
-from awds.spectra import Spectra
+from awds.spectra import FFTBackend, Spectra, SpectrogramCache
 from awds.whistler import WhistlerModel
 from awds.persistence import StoreInterface
 
@@ -34,7 +34,26 @@ def get_value_base_on_l(L):
 
 
 class AWDS:
-    def main(self, reader: ReaderInterface, store: StoreInterface, path, file_name, debug_enabled=False):
+    def main(self, reader: ReaderInterface, store: StoreInterface, path, file_name, debug_enabled=False,
+             channels=None, fusion='majority', dtype=None, cache: SpectrogramCache = None, band_limited=False,
+             decimate=False, fft: FFTBackend = None):
+        """Burst detection of a file, stored in <file>.pkl.
+        Params
+            channels: EFD components to analyse together (e.g. ['A131', 'A132', 'A133']), stacked and processed
+                      in one pass; None analyses the default signal of the reader
+            fusion: rule fusing the detections of the components, see AdaptiveThreshold.fuse_channels
+            dtype: floating type of the whole chain, np.float32 halves the memory of spectrograms, kernels and
+                   correlations; None keeps float32 spectrograms and float64 kernels and correlations
+            cache: SpectrogramCache the spectrograms are taken from and added to, shared with the visualizer
+            band_limited: compute only the bins of the band of L (Spectra.spectrogram_band) instead of the full
+                          spectrogram, equal to its slice within float rounding
+            decimate: band-limited spectrogram of the signal decimated by the largest factor the band of L allows
+                      (Spectra.decimation_factor), same time and frequency grid; opt-in, the anti-aliasing filter
+                      costs more than band_limited and changes a few detections (benchmarks/bench_decimation.py)
+            fft: FFTBackend of the spectrograms and FFT correlations, e.g. FFTBackend(workers=-1) for all the cores
+                 on a single file"""
+        if fusion not in AdaptiveThreshold.FUSION_RULES:
+            raise ValueError(f"fusion must be one of {list(AdaptiveThreshold.FUSION_RULES)}, got {fusion}")
         self.__print(debug_enabled, f"Reading File {file_name}")
         # pre-processing data
         
@@ -43,76 +62,59 @@ class AWDS:
             os.makedirs(directory_path)
 
         try:
-            vlf = reader.read(path, file_name)
-            spectra = Spectra()
+            spectra = Spectra(dtype, cache, fft)
             df_w = store.create_df()
 
             loc = 0
-            whistlers_file = os.path.join(directory_path, file_name.replace(vlf.file_extension, "pkl"))
-            if vlf.split is not None:
-                n = 0
-                for df in vlf.split:
-                    try:
-                        start_analysis = (str(df.DateTime.values[0]), str(df.DateTime.values[-1]), 0, 20e3, -1, 0, -1)
-                        store.add_info_to_df(df, df_w, loc, start_analysis)
+            whistlers_file = os.path.join(directory_path, os.path.splitext(file_name)[0] + ".pkl")
+            n = 0
+            # segments are read one at a time, memory stays bounded by a single segment
+            segments = reader.iter_vlf_segments(path, file_name) if channels is None else \
+                reader.iter_vlf_segments(path, file_name, channels=channels)
+            for segment in segments:
+                n += 1
+                try:
+                    start_analysis = (str(segment.t0), str(segment.t1), 0, 20e3, -1, 0, -1)
+                    store.add_info_to_df(segment, df_w, loc, start_analysis)
+                    loc += 1
+
+                    L = segment.L
+                    key = None if cache is None else SpectrogramCache.segment_key(path, file_name, segment, channels)
+                    if band_limited or decimate:
+                        low_f, high_f = get_value_base_on_l(L)[:2]
+                        decimation = spectra.decimation_factor(high_f, segment.fs) if decimate else 1
+                        f_res = spectra.get_freq_res(spectra.frequencies(segment.fs))
+                        freqs, time, spectrogram = spectra.spectrogram_band(segment.signal, segment.fs, low_f / 1e3,
+                                                                            high_f / 1e3, key=key,
+                                                                            decimation=decimation)
+                    else:
+                        freqs, time, spectrogram = spectra.spectrogram(segment.signal, segment.fs, key=key)
+                        f_res = spectra.get_freq_res(freqs)
+                    time = time * 2
+                    self.__print(debug_enabled, f"L value {L}")
+
+                    t_res = spectra.get_time_res(time)
+                    bboxes, d0 = self.detect(spectra, spectrogram, freqs, t_res, f_res, L, debug_enabled,
+                                             fusion=fusion, dtype=dtype, band=band_limited or decimate)
+
+                    for output in bboxes:
+                        start = output[0] * 1000
+                        end = output[1] * 1000
+                        start_time = segment.t0 + np.timedelta64(int(start), 'ms')
+                        end_time = segment.t0 + np.timedelta64(int(end), 'ms')
+
+                        output_analysis = (
+                            str(start_time), str(end_time), output[2] * 1e3, output[3] * 1e3,
+                            d0, output[5], int(output[4]))
+                        store.add_info_to_df(segment, df_w, loc, output_analysis)
                         loc += 1
 
-                        n += 1
-                        L = df.L.values[0]
-                        vlf_signal = np.asarray(list(chain.from_iterable(df.Signal.values)))
-                        freqs, time, spectrogram = spectra.spectrogram(vlf_signal, df.Frequency.values[0])
-                        time = time * 2
-                        self.__print(debug_enabled, f"L value {L}")
-
-                        t_res, f_res = spectra.get_time_res(time), spectra.get_freq_res(freqs)
-                        low_f, high_f, fn, d0, d0_min, d0_max = get_value_base_on_l(L)
-                        lower_freq, upper_freq = low_f / 1e3, high_f / 1e3
-
-                        self.__print(debug_enabled, "Generate Kernel")
-                        # generate whistler model for correlation
-                        modelW = WhistlerModel(t_res, f_res, low_f, high_f, fn)
-                        kernel = modelW.whistler_sim(d0)
-
-                        self.__print(debug_enabled, "Apply Transformations")
-                        # apply transformations
-                        spectrogramSlice = spectra.apply_slice(lower_freq, upper_freq, freqs, spectrogram)
-                        spectrogramSliceZscore = spectra.apply_zscore(spectrogramSlice[0])
-
-                        self.__print(debug_enabled, "Get Correlations")
-                        corr = spectra.get_correlation(spectrogramSliceZscore, kernel)
-
-                        self.__print(debug_enabled, "Detecting")
-                        # detect process
-                        adaptiveThreshold = AdaptiveThreshold()
-                        detector = Detector()
-                        pulse = adaptiveThreshold.detection_pulse(corr, 'fusion_cfar')
-                        self.__print(debug_enabled, f"detection_pulse {len(pulse)}")
-                        start_index = detector.detection_starting_locations(corr, pulse, t_res)
-                        self.__print(debug_enabled, f"detection_starting_locations {len(start_index)}")
-                        outputs = detector.detection_starting_locations_final(start_index)
-                        self.__print(debug_enabled, f"Outputs {len(outputs)}")
-                        self.__print(debug_enabled, "Detect locations")
-                        bboxes = detector.detection_bounding_boxes(outputs, spectrogramSliceZscore, t_res, f_res,
-                                                                   lower_freq,
-                                                                   upper_freq, modelW, d0_min, d0_max)
-
-                        for output in bboxes:
-                            start = output[0] * 1000
-                            end = output[1] * 1000
-                            start_time = df.DateTime.values[0] + np.timedelta64(int(start), 'ms')
-                            end_time = df.DateTime.values[0] + np.timedelta64(int(end), 'ms')
-
-                            output_analysis = (
-                                str(start_time), str(end_time), output[2] * 1e3, output[3] * 1e3,
-                                d0, output[5], int(output[4]))
-                            store.add_info_to_df(df, df_w, loc, output_analysis)
-                            loc += 1
-
-                    except Exception as e:
-                        self.__print(debug_enabled, f"error {repr(e)}")
-                        error_analysis = (str(df.DateTime.values[0]), str(df.DateTime.values[-1]), -2, -2, -2, -2, -2)
-                        store.add_info_to_df(df, df_w, loc, error_analysis)
+                except Exception as e:
+                    self.__print(debug_enabled, f"error {repr(e)}")
+                    error_analysis = (str(segment.t0), str(segment.t1), -2, -2, -2, -2, -2)
+                    store.add_error_to_df(segment, df_w, loc, error_analysis)
 
+            if n > 0:
                 df_w.to_pickle(whistlers_file)
             else:
                 f = open(os.path.join(directory_path, "no_burst_found.txt"), "a")
@@ -124,6 +126,145 @@ class AWDS:
             f.write(f"{file_name}\n")
             f.close()
 
+    def survey(self, reader: EFD, store: StoreInterface, path, file_name, channel='A131', debug_enabled=False,
+               dtype=None):
+        """Whistler detection on the on-board survey power spectra (A13x_P) of the non-burst rows.
+        The spectra go through the same normalization, correlation and CFAR chain as the burst spectrograms, at
+        their native resolution (one column per row), so no FFT is computed. Detections are stored in
+        <file>_survey.pkl, next to the burst ones.
+        At the survey time resolution a whistler spans one column, so D0 is not resolved and the detections
+        mark where the burst analysis is worth running."""
+        self.__print(debug_enabled, f"Reading survey {file_name}")
+        directory_path = PKL_FOLDER
+        if not os.path.exists(directory_path):
+            os.makedirs(directory_path)
+
+        vlf = reader.read_survey(path, file_name, channel)
+        if vlf.vlf_signal is None:
+            f = open(os.path.join(directory_path, "error_open_file.txt"), "a")
+            f.write(f"{file_name}\n")
+            f.close()
+            return
+
+        freqs = vlf.other / 1e3
+
+        def spectrogram(df):
+            power = np.stack(df.Spectrum.values).T
+            t_res = np.median(np.diff(df.DateTime.values)) / np.timedelta64(1, 's')
+            return freqs, t_res, np.log10(np.maximum(power, np.finfo(power.dtype).tiny))
+
+        whistlers_file = os.path.join(directory_path, os.path.splitext(file_name)[0] + "_survey.pkl")
+        self.__detect_spectrograms(store, vlf.split, spectrogram, whistlers_file, debug_enabled, dtype)
+
+    def spectral(self, reader: ReaderInterface, store: StoreInterface, path, file_name, debug_enabled=False,
+                 dtype=None):
+        """Whistler detection on a spectral product (e.g. Demeter1132), stored in <file>.pkl.
+        The reader gives the spectrogram of each segment with spectrogram(df), Spectra.spectrogram is not used."""
+        self.__print(debug_enabled, f"Reading File {file_name}")
+        directory_path = PKL_FOLDER
+        if not os.path.exists(directory_path):
+            os.makedirs(directory_path)
+
+        try:
+            vlf = reader.read(path, file_name)
+        except Exception:
+            f = open(os.path.join(directory_path, "error_open_file.txt"), "a")
+            f.write(f"{file_name}\n")
+            f.close()
+            return
+
+        def spectrogram(df):
+            freqs, time, Sxx = reader.spectrogram(df)
+            return freqs, np.median(np.diff(time)), Sxx
+
+        whistlers_file = os.path.join(directory_path, os.path.splitext(file_name)[0] + ".pkl")
+        self.__detect_spectrograms(store, vlf.split, spectrogram, whistlers_file, debug_enabled, dtype)
+
+    def __detect_spectrograms(self, store, segments, spectrogram, whistlers_file, debug_enabled, dtype=None):
+        """Detection on precomputed spectrograms, spectrogram(df) -> (freqs in kHz, t_res, log10 spectrogram)"""
+        spectra = Spectra(dtype)
+        df_w = store.create_df()
+        loc = 0
+        for df in segments:
+            if len(df) < 2:
+                continue
+            try:
+                start_analysis = (str(df.DateTime.values[0]), str(df.DateTime.values[-1]), 0, 20e3, -1, 0, -1)
+                store.add_info_to_df(df, df_w, loc, start_analysis)
+                loc += 1
+
+                L = df.L.values[0]
+                freqs, t_res, Sxx = spectrogram(df)
+                bboxes, d0 = self.detect(spectra, Sxx, freqs, t_res, spectra.get_freq_res(freqs), L, debug_enabled,
+                                         window=max(1, 2 * t_res), dtype=dtype)
+
+                for output in bboxes:
+                    start_time = df.DateTime.values[0] + np.timedelta64(int(output[0] * 1000), 'ms')
+                    end_time = df.DateTime.values[0] + np.timedelta64(int(output[1] * 1000), 'ms')
+                    output_analysis = (
+                        str(start_time), str(end_time), output[2] * 1e3, output[3] * 1e3,
+                        d0, output[5], int(output[4]))
+                    store.add_info_to_df(df, df_w, loc, output_analysis)
+                    loc += 1
+
+            except Exception as e:
+                self.__print(debug_enabled, f"error {repr(e)}")
+                error_analysis = (str(df.DateTime.values[0]), str(df.DateTime.values[-1]), -2, -2, -2, -2, -2)
+                store.add_error_to_df(df, df_w, loc, error_analysis)
+                loc += 1
+
+        df_w.to_pickle(whistlers_file)
+
+    def detect(self, spectra: Spectra, spectrogram, freqs, t_res, f_res, L, debug_enabled=False, window=1,
+               fusion='majority', dtype=None, band=False):
+        """Normalization, correlation and CFAR chain on one log10 spectrogram (freq x time, freqs in kHz).
+        A stacked (channel, freq, time) spectrogram goes through every stage in one pass and the detections of
+        the components are fused with the given rule, see AdaptiveThreshold.fuse_channels.
+        dtype, when given, is the floating type of the kernels, correlations and CFAR thresholds.
+        With band, spectrogram and freqs are already the band of L (Spectra.spectrogram_band) and f_res is the one
+        of the full spectrogram.
+        Return
+            bboxes: detections, see Detector.detection_bounding_boxes
+            d0: D0 of the kernel used for the correlation"""
+        low_f, high_f, fn, d0, d0_min, d0_max = get_value_base_on_l(L)
+        lower_freq, upper_freq = low_f / 1e3, high_f / 1e3
+
+        self.__print(debug_enabled, "Generate Kernel")
+        # generate whistler model for correlation
+        modelW = WhistlerModel(t_res, f_res, low_f, high_f, fn, dtype)
+        kernel = modelW.whistler_sim(d0)
+
+        self.__print(debug_enabled, "Apply Transformations")
+        # apply transformations
+        spectrogramSlice = (spectrogram, freqs) if band else \
+            spectra.apply_slice(lower_freq, upper_freq, freqs, spectrogram)
+        spectrogramSliceZscore = spectra.apply_zscore(spectrogramSlice[0])
+
+        self.__print(debug_enabled, "Get Correlations")
+        corr = spectra.get_correlation(spectrogramSliceZscore, kernel)
+
+        self.__print(debug_enabled, "Detecting")
+        # detect process
+        adaptiveThreshold = AdaptiveThreshold(dtype)
+        detector = Detector()
+        if corr.ndim > 1:
+            # stacked components: one score and one decision out of their evidence
+            pulse = adaptiveThreshold.detection_pulse(corr, 'fusion_cfar') if fusion != 'sum' else None
+            corr, pulse = adaptiveThreshold.fuse_channels(corr, pulse, fusion)
+            spectrogramSliceZscore = spectrogramSliceZscore.sum(axis=0)
+        else:
+            pulse = adaptiveThreshold.detection_pulse(corr, 'fusion_cfar')
+        self.__print(debug_enabled, f"detection_pulse {len(pulse)}")
+        start_index = detector.detection_starting_locations(corr, pulse, t_res)
+        self.__print(debug_enabled, f"detection_starting_locations {len(start_index)}")
+        outputs = detector.detection_starting_locations_final(start_index)
+        self.__print(debug_enabled, f"Outputs {len(outputs)}")
+        self.__print(debug_enabled, "Detect locations")
+        bboxes = detector.detection_bounding_boxes(outputs, spectrogramSliceZscore, t_res, f_res,
+                                                   lower_freq, upper_freq, modelW, d0_min, d0_max,
+                                                   window=window, dtype=dtype, fft=spectra.fft)
+        return bboxes, d0
+
     @staticmethod
     def __print(enabled, text):
         if enabled:
@@ -1,13 +1,13 @@
 import os
 import struct
-from datetime import datetime, timedelta
+from datetime import datetime
 from io import open
 
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
-from awds.reader import ReaderInterface, VLFInformation
+from awds.reader import ReaderInterface, VLFInformation, VLFSegment, flat_rows, segment_bounds, split_frame, \
+    utc_time_to_datetime64
 
 
 def chunks(array, size):
@@ -15,6 +15,73 @@ def chunks(array, size):
     return (array[i:i + size] for i in range(0, len(array), size))
 
 
+# date, orbit, geomagnetic and data type blocks shared by the DEMETER level 1 records: name -> (format, offset)
+COMMON_FIELDS = {
+    'date': (('>i2', 7), 8),
+    'orbit': (('>i2', 2), 22),
+    'orbit_param': (('>f4', 3), 38),
+    'geomag_param': (('>f4', 15), 54),
+    'DataType': ('V21', 204),
+}
+COMMON_PARAMS = ["GeocLat", "GeocLong", "Altitude", "GeomagLat", "GeomagLong", "MLT", "InvLat", "L", "ConjsatGeocLat",
+                 "ConjsatGeocLong", "Nconj110GeocLat", "Nconj110GeocLong", "Sconj110GeocLat", "Sconj110GeocLong",
+                 "b_field_x", "b_field_y", "b_field_z", "GyroFreq"]
+
+
+def record_dtype(fields, itemsize):
+    """Structured dtype of a record from name -> (format, offset)"""
+    return np.dtype({'names': list(fields), 'formats': [f for f, _ in fields.values()],
+                     'offsets': [offset for _, offset in fields.values()], 'itemsize': itemsize})
+
+
+def common_columns(records):
+    """DateTime, OrbitNumber, SubOrbitType, COMMON_PARAMS and DataType columns of decoded records"""
+    columns = {"DateTime": date_to_datetime64(records['date'])}
+    columns['OrbitNumber'], columns['SubOrbitType'] = records['orbit'].astype(np.int64).T
+    params = np.concatenate((records['orbit_param'], records['geomag_param']), axis=1).astype(np.float64)
+    for i, name in enumerate(COMMON_PARAMS):
+        columns[name] = params[:, i]
+    columns['DataType'] = bytes_column(records['DataType'])
+    return columns
+
+
+def date_to_datetime64(date):
+    """DEMETER dates, (rows, 7) year, month, day, hour, minute, second, millisecond, as datetime64[ns]"""
+    date = np.asarray(date).astype(np.int64)
+    utc_time = date[:, 0]
+    for i, scale in enumerate([100, 100, 100, 100, 100, 1000]):
+        utc_time = utc_time * scale + date[:, i + 1]
+    return utc_time_to_datetime64(utc_time).astype('datetime64[ns]')
+
+
+def bytes_column(values):
+    """Raw bytes of each item of a fixed size field, as struct 's' returns them"""
+    return np.array([value.tobytes() for value in values], dtype=object)
+
+
+def record_segments(columns, signal, seconds, first=0, sampling_frequency=None):
+    """VLFSegments of decoded records cut in time segments as split_frame does, without building a frame.
+    Params
+        columns: name -> per-record column, as common_columns returns them
+        signal: (records, samples) signal field of the records, e.g. a view on their memory map; the signal of a
+                segment is its slice, converted to native floats in one copy
+        sampling_frequency: fs of the segments, the 'Frequency' of their first record when None"""
+    starts, stops = segment_bounds(columns['DateTime'], seconds)
+    for start, stop in zip(starts[first:], stops[first:]):
+        metadata = {name: values[start] for name, values in columns.items() if name != 'DateTime'}
+        yield VLFSegment(flat_rows(signal[start:stop]),
+                         metadata['Frequency'] if sampling_frequency is None else sampling_frequency,
+                         columns['DateTime'][start], columns['DateTime'][stop - 1], metadata['L'],
+                         metadata['GeocLat'], metadata['GeocLong'], metadata)
+
+
+def row_column(rows):
+    column = np.empty(len(rows), dtype=object)
+    for i in range(len(rows)):
+        column[i] = rows[i]
+    return column
+
+
 class Demeter1131(ReaderInterface):
     """
      file description
@@ -43,70 +110,74 @@ class Demeter1131(ReaderInterface):
                      "DataUnit", "Frequency", "SampleNumber",
                      "TotalDuration", "Nam1c"]
 
+    # one record of the file, big-endian, fields at their byte offsets
+    RECORD = record_dtype(dict(COMMON_FIELDS,
+                               CoordSystem=('V9', HEADER_START_POSITION),
+                               DataUnit=('V16', HEADER_START_POSITION + 9),
+                               Frequency=('>f4', HEADER_START_POSITION + 25),
+                               SampleNumber=('>i2', HEADER_START_POSITION + 29),
+                               TotalDuration=('>f4', HEADER_START_POSITION + 31),
+                               Nam1c=('V3', HEADER_START_POSITION + 35),
+                               Signal=(('>f4', (SIGNAL_END_POSITION - SIGNAL_START_POSITION) // 4),
+                                       SIGNAL_START_POSITION)),
+                          ROW_SIZE)
+
     def read_df(self, path: str, file_name: str):
         full_path = path + file_name
-        with open(full_path, "rb") as binary_file:
-            # Read the whole file at once
-            _df = self.__read_lines(binary_file.read())
-
-        return _df
+        return self.__read_records(full_path)
 
     # np.asarray(list(chain.from_iterable(_df.Signal.values)))
-    def read(self, path: str, file_name: str, split_seconds: int = 10) -> VLFInformation:
+    def read(self, path: str, file_name: str, split_seconds: int = 10, channels=None) -> VLFInformation:
+        # single channel product, channels is accepted for the reader interface only
         full_path = os.path.join(path, file_name)
-        with open(full_path, "rb") as binary_file:
-            # Read the whole file at once
-            _df = self.__read_lines(binary_file.read())
+        _df = self.__read_records(full_path)
 
         return VLFInformation(file_name, "dat", _df.L.values.mean(), _df.Frequency.loc[0], vlf_signal=None,
                               split=self.split_file(_df, split_seconds))
 
     def split_file(self, df, seconds, overlap=0):
-        start_time = df.DateTime.loc[0] - timedelta(seconds=overlap)
-        split = []
-        while True:
-            end_time = start_time + timedelta(seconds=seconds + overlap)
-            mask = (df.DateTime > start_time) & (df.DateTime <= end_time)
-            value = df.loc[mask]
-            if value.size > 0:
-                split.append(value)
-
-            if start_time > df.DateTime.values[-1]:
-                break
-            else:
-                start_time = end_time - timedelta(seconds=overlap)
-
-        return split
-
-    def __read_lines(self, data):
-        rows = int(len(data) / self.ROW_SIZE)
+        return split_frame(df, seconds, overlap)
+
+    def iter_vlf_segments(self, path: str, file_name: str, split_seconds: int = 10, first=0, channels=None):
+        """Segments cut straight from the memory map of the records, without the frame of read()."""
+        records = self.__records(os.path.join(path, file_name))
+        if records.size < 1:
+            return
+        yield from record_segments(self.__columns(records), records[self.SIGNAL], split_seconds, first)
+
+    def __records(self, full_path):
+        """Records of a file as a plain ndarray on its memory map, the signal pages are only read when a row is
+        used; a trailing partial record is ignored."""
+        rows = os.path.getsize(full_path) // self.ROW_SIZE
+        if rows < 1:
+            return np.empty(0, dtype=self.RECORD)
+        return np.memmap(full_path, dtype=self.RECORD, mode='r', shape=(rows,)).view(np.ndarray)
+
+    def __columns(self, records):
+        """Decoded columns of the records, all but the signal"""
+        columns = common_columns(records)
+        for name in ['CoordSystem', 'DataUnit', 'Nam1c']:
+            columns[name] = bytes_column(records[name])
+        columns['Frequency'] = records['Frequency'].astype(np.float64)
+        columns['SampleNumber'] = records['SampleNumber'].astype(np.int64)
+        columns['TotalDuration'] = records['TotalDuration'].astype(np.float64)
+        return columns
+
+    def __read_records(self, full_path):
+        """Decode the whole file at once through a memory map of its records, a trailing partial record is
+        ignored."""
         fullList = self.BASIC_COLUMNS.copy()
         fullList.append(self.SIGNAL)
         fullList.insert(0, self.DATE_TIME)
-        listp = []
-        n = 0
-        # with tqdm(total=rows) as pbar:
-        for line in chunks(data, self.ROW_SIZE):
-            date = struct.unpack(">7h", line[self.DATE_START_POSITION:self.DATE_END_POSITION])
-            orbit_n = struct.unpack(">2h", line[self.DATE_END_POSITION:self.DATE_END_POSITION + 4])
-            orbit_param = struct.unpack(">3f", line[self.ORBIT_PARAM_START_POSITION:self.ORBIT_PARAM_END_POSITION])
-            geomag_param = struct.unpack(">15f",
-                                         line[self.GEOMAG_PARAM_START_POSITION:self.GEOMAG_PARAM_END_POSITION])
-            data_type = struct.unpack("@21s", line[self.DATA_TYPE_START_POSITION:self.DATA_TYPE_END_POSITION])
-            header_info = struct.unpack(">9s16sfhf3s", line[self.HEADER_START_POSITION:self.HEADER_END_POSITION])
-            dt = np.dtype(np.float32)
-            dt = dt.newbyteorder('>')
-            array = np.frombuffer(line[self.SIGNAL_START_POSITION:self.SIGNAL_END_POSITION], dtype=dt)
+        records = self.__records(full_path)
+        if records.size < 1:
+            return pd.DataFrame([], columns=fullList)
 
-            dt_string = f"{date[0]} {date[1]} {date[2]} {date[3]} {date[4]} {date[5]} {date[6]}"
-            dt_object = datetime.strptime(dt_string, "%Y %m %d %H %M %S %f")
-
-            t_f = (dt_object,) + orbit_n + orbit_param + geomag_param + data_type + header_info + (array,)
-            listp.append(t_f)
-            n += 1
-            # pbar.update(1)
+        columns = self.__columns(records)
+        # big-endian rows, views on the mapping as the struct reader returned views on the file bytes
+        columns[self.SIGNAL] = row_column(records['Signal'])
 
-        return pd.DataFrame(listp, columns=fullList)
+        return pd.DataFrame(columns, columns=fullList)
 
 
 class Demeter1132(ReaderInterface):
@@ -131,72 +202,103 @@ class Demeter1132(ReaderInterface):
     SIGNAL = "Signal"
     DATE_TIME = "DateTime"
     BASIC_COLUMNS = ["NB", "NBF", "TOTAL_DUR", "FREQ_RES"]
+    # NB spectra of NBF bins per record, the record size follows from the first header
+    NUMBERS_FIELDS = {
+        'NB': ('u1', 285),
+        'NBF': ('>i2', 286),
+        'TOTAL_DUR': ('>f4', 288),
+        'FREQ_RES': ('>f4', 292),
+    }
+    DATA_START_POSITION = 204 + 114
 
     def read_df(self, path: str, file_name: str):
         full_path = path + file_name
-        with open(full_path, "rb") as binary_file:
-            # Read the whole file at once
-            _df = self.__read_lines(binary_file.read())
+        return self.__read_records(full_path)
 
-        return _df
+    def read(self, path: str, file_name: str, split_seconds: int = 10, channels=None) -> VLFInformation:
+        """Decoded spectra of a file, split in segments; other holds the frequency of each bin in Hz.
+        The spectra are not a waveform: they go to the detector through spectrogram(), not Spectra.spectrogram.
+        The sampling frequency is the one of a waveform with the same bins, 2 * NBF * FREQ_RES."""
+        # single channel product, channels is accepted for the reader interface only
+        full_path = os.path.join(path, file_name)
+        _df = self.__read_records(full_path)
+        nbf, freq_res = _df.NBF.values[0], _df.FREQ_RES.values[0]
 
-    # np.asarray(list(chain.from_iterable(_df.Signal.values)))
-    def read(self, path: str, file_name: str, split_seconds: int = 10) -> VLFInformation:
-        full_path = path + file_name
-        with open(full_path, "rb") as binary_file:
-            # Read the whole file at once
-            _df = self.__read_lines(binary_file.read())
-
-        return VLFInformation(file_name, "dat", _df.L.values.mean(), _df.Frequency.loc[0], vlf_signal=None,
-                              split=self.split_file(_df, split_seconds))
+        return VLFInformation(file_name, "dat", _df.L.values.mean(), 2 * nbf * freq_res, vlf_signal=None,
+                              split=self.split_file(_df, split_seconds), other=np.arange(nbf) * freq_res)
 
     def split_file(self, df, seconds, overlap=0):
-        start_time = df.DateTime.loc[0] - timedelta(seconds=overlap)
-        split = []
-        while True:
-            end_time = start_time + timedelta(seconds=seconds + overlap)
-            mask = (df.DateTime > start_time) & (df.DateTime <= end_time)
-            value = df.loc[mask]
-            if value.size > 0:
-                split.append(value)
-
-            if start_time > df.DateTime.values[-1]:
-                break
-            else:
-                start_time = end_time - timedelta(seconds=overlap)
-
-        return split
-
-    def __read_lines(self, data):
-        number = struct.unpack(">Bh2f", data[285:296])
-        start = 204 + 114
-        row_size = (number[0] * number[1] * 4) + start
-        rows = int(len(data) / row_size)
-        fullList = self.BASIC_COLUMNS.copy()
+        return split_frame(df, seconds, overlap)
+
+    def spectrogram(self, df, log10=True, kHz=True):
+        """Spectrogram of the records of df, laid out as Spectra.spectrogram returns it
+        Return
+            freqs: bin frequencies
+            time: seconds from the first record, one entry per spectrum
+            Sxx: (freq, time) spectra, log10 unless disabled"""
+        nb, nbf = int(df.NB.values[0]), int(df.NBF.values[0])
+        freqs = np.arange(nbf) * df.FREQ_RES.values[0]
+        start = (df.DateTime.values - df.DateTime.values[0]) / np.timedelta64(1, 's')
+        time = (start[:, None] + np.arange(nb) * (df.TOTAL_DUR.values[0] / nb)).ravel()
+        Sxx = np.stack(df.Signal.values).reshape(-1, nbf).T.astype(np.float32)
+
+        if kHz:
+            freqs = freqs / 1e3
+        if log10:
+            Sxx = np.log10(np.maximum(Sxx, np.finfo(Sxx.dtype).tiny))
+
+        return freqs, time, Sxx
+
+    def iter_vlf_segments(self, path: str, file_name: str, split_seconds: int = 10, first=0, channels=None):
+        """Segments cut straight from the memory map of the records, without the frame of read(). The signal of a
+        segment is its NB * NBF spectra values, record after record, and fs the one of read()."""
+        records = self.__records(os.path.join(path, file_name))
+        if records.size < 1:
+            return
+        fs = 2 * int(records['NBF'][0]) * float(records['FREQ_RES'][0])
+        yield from record_segments(self.__columns(records), records[self.SIGNAL], split_seconds, first, fs)
+
+    def __records(self, full_path):
+        """Records of a file as a plain ndarray on its memory map. NB and NBF must be the same in every record,
+        ValueError otherwise; a trailing partial record is ignored."""
+        numbers = record_dtype(self.NUMBERS_FIELDS, self.DATA_START_POSITION)
+        if os.path.getsize(full_path) < numbers.itemsize:
+            return np.empty(0, dtype=numbers)
+
+        first = np.fromfile(full_path, dtype=numbers, count=1)[0]
+        nb, nbf = int(first['NB']), int(first['NBF'])
+        row_size = self.DATA_START_POSITION + nb * nbf * 4
+        rows = os.path.getsize(full_path) // row_size
+        fields = dict(COMMON_FIELDS, **self.NUMBERS_FIELDS)
+        fields[self.SIGNAL] = (('>f4', nb * nbf), self.DATA_START_POSITION)
+        records = np.memmap(full_path, dtype=record_dtype(fields, row_size), mode='r',
+                            shape=(rows,)).view(np.ndarray)
+        if (records['NB'] != nb).any() or (records['NBF'] != nbf).any():
+            raise ValueError(f"{full_path}: NB/NBF change between records")
+        return records
+
+    def __columns(self, records):
+        """Decoded columns of the records, all but the signal"""
+        columns = common_columns(records)
+        columns['NB'] = records['NB'].astype(np.int64)
+        columns['NBF'] = records['NBF'].astype(np.int64)
+        columns['TOTAL_DUR'] = records['TOTAL_DUR'].astype(np.float64)
+        columns['FREQ_RES'] = records['FREQ_RES'].astype(np.float64)
+        return columns
+
+    def __read_records(self, full_path):
+        """Decode the whole file at once through a memory map of its records, see __records."""
+        fullList = ["DateTime", "OrbitNumber", "SubOrbitType"] + COMMON_PARAMS + ["DataType"] + self.BASIC_COLUMNS
         fullList.append(self.SIGNAL)
-        fullList.insert(0, self.DATE_TIME)
-        listp = []
-        n = 0
+        records = self.__records(full_path)
+        if records.size < 1:
+            return pd.DataFrame([], columns=fullList)
 
-        # with tqdm(total=rows) as pbar:
-        for line in chunks(data, row_size):
-            date = struct.unpack(">7h", line[self.DATE_START_POSITION:self.DATE_END_POSITION])
-
-            header = struct.unpack(">Bh2f", line[285:296])
-
-            dt = np.dtype(np.float32)
-            dt = dt.newbyteorder('>')
-            array = np.frombuffer(line[start:], dtype=dt)
-
-            dt_string = f"{date[0]} {date[1]} {date[2]} {date[3]} {date[4]} {date[5]} {date[6]}"
-            dt_object = datetime.strptime(dt_string, "%Y %m %d %H %M %S %f")
-
-            t_f = (dt_object,) + header + (array,)
-            listp.append(t_f)
-            n += 1
-            # pbar.update(1)
+        columns = self.__columns(records)
+        # big-endian rows of NB * NBF values, views on the mapping
+        columns[self.SIGNAL] = row_column(records[self.SIGNAL])
 
-        return pd.DataFrame(listp, columns=fullList)
+        return pd.DataFrame(columns, columns=fullList)
 
 
 class Demeter1138:
@@ -275,45 +377,56 @@ class Demeter1138:
 
         return pd.DataFrame(listp, columns=fullList)
 
-    def make_df_for_analysis(self, df):
-        columns = ["L", "OrbitNumber", "SubOrbitType", "GeocLat", "GeocLong", "Altitude", "GeomagLat",
-                   "GeomagLong"]
-
-        classed_c = ['DateTime', "L", "OrbitNumber", "SubOrbitType", "GeocLat", "GeocLong", "Altitude", "GeomagLat",
-                     "GeomagLong",
-                     '(0.0-2.5)',
-                     '(2.5-3.2)',
-                     '(3.2-4.0)',
-                     '(4.0-5.0)',
-                     '(5.0-6.3)',
-                     '(6.3-7.9)',
-                     '(7.9-10.0)',
-                     '(10.0-12.6)',
-                     '(12.6-15.9)',
-                     '(15.9-20.0)',
-                     '(20.0-25.2)',
-                     '(25.2-31.7)',
-                     '(31.7-40.0)',
-                     '(40.0-50.4)',
-                     '(50.4-63.5)',
-                     '(63.5-80.0)',
-                     '(80.0-101.0)',
-                     '(101.0-127.0)',
-                     '(127.0-202.0)',
-                     '(0.0-0.0)']
+    # intensity rows of a record and classes per row of SP_INTENS_TABLE
+    INTENSITY_ROWS, INTENSITY_CLASSES = 128, 20
+    ANALYSIS_COLUMNS = ["L", "OrbitNumber", "SubOrbitType", "GeocLat", "GeocLong", "Altitude", "GeomagLat",
+                        "GeomagLong"]
+    CLASSES = ['(0.0-2.5)', '(2.5-3.2)', '(3.2-4.0)', '(4.0-5.0)', '(5.0-6.3)', '(6.3-7.9)', '(7.9-10.0)',
+               '(10.0-12.6)', '(12.6-15.9)', '(15.9-20.0)', '(20.0-25.2)', '(25.2-31.7)', '(31.7-40.0)',
+               '(40.0-50.4)', '(50.4-63.5)', '(63.5-80.0)', '(80.0-101.0)', '(101.0-127.0)', '(127.0-202.0)',
+               '(0.0-0.0)']
+
+    def analysis_arrays(self, df):
+        """Intensity tables of all the records as arrays
+        Return
+            intensity: (records, 128, 20) uint8 SP_INTENS_TABLE cubes
+            time: (records, 128) datetime64[ms] time of each intensity row, T_RES apart
+            mask: (records, 128) rows with at least one non-zero class"""
+        intensity = np.stack(df['SP_INTENS_TABLE'].values).reshape(-1, self.INTENSITY_ROWS, self.INTENSITY_CLASSES)
+        offsets = (df['T_RES'].values.astype(np.float64)[:, None] * np.arange(self.INTENSITY_ROWS) * 1000)
+        time = df.DateTime.values.astype('datetime64[ms]')[:, None] + \
+            offsets.astype(np.int64).astype('timedelta64[ms]')
+        mask = intensity.any(axis=2)
+        return intensity, time, mask
 
-        listp = []
-        for i in tqdm(range(df.shape[0])):
-            df_loc = df.loc[i]
-            v = df_loc['SP_INTENS_TABLE'].reshape(128, 20)
-
-            for index in range(v.shape[0]):
-                res = df_loc['T_RES'] * index * 1000
-                array_v = v[index]
-                count = np.count_nonzero(array_v)
-                if count > 0:
-                    values = tuple(v[index])
-                    time = df_loc.DateTime + np.timedelta64(int(res), 'ms')
-                    listp.append((time,) + tuple(df_loc[columns].values) + values)
-
-        return pd.DataFrame(listp, columns=classed_c)
+    def make_df_for_analysis(self, df):
+        intensity, time, mask = self.analysis_arrays(df)
+        records = np.nonzero(mask)[0]
+        columns = {'DateTime': time[mask]}
+        for name in self.ANALYSIS_COLUMNS:
+            columns[name] = df[name].values[records]
+        values = intensity[mask]
+        for i, name in enumerate(self.CLASSES):
+            columns[name] = values[:, i]
+
+        return pd.DataFrame(columns, columns=['DateTime'] + self.ANALYSIS_COLUMNS + self.CLASSES)
+
+    def save_analysis(self, df, path):
+        """Store the non-empty intensity rows in a compressed .npz instead of a DataFrame: intensity (rows, 20)
+        uint8, time, the record of each row and the ANALYSIS_COLUMNS of the records."""
+        intensity, time, mask = self.analysis_arrays(df)
+        columns = {name: df[name].values for name in self.ANALYSIS_COLUMNS}
+        np.savez_compressed(path, intensity=intensity[mask], time=time[mask],
+                            record=np.nonzero(mask)[0].astype(np.int32), **columns)
+
+    def load_analysis(self, path):
+        """Frame of make_df_for_analysis from a file written by save_analysis"""
+        with np.load(path) as arrays:
+            record = arrays['record']
+            columns = {'DateTime': arrays['time']}
+            for name in self.ANALYSIS_COLUMNS:
+                columns[name] = arrays[name][record]
+            for i, name in enumerate(self.CLASSES):
+                columns[name] = arrays['intensity'][:, i]
+
+        return pd.DataFrame(columns, columns=['DateTime'] + self.ANALYSIS_COLUMNS + self.CLASSES)
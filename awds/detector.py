@@ -2,11 +2,11 @@ import numpy as np
 from scipy import signal
 
 from awds.adaptive_threshold import AdaptiveThreshold
+from awds.spectra import FFTBackend
 from awds.whistler import WhistlerModel
 
 
 class Detector:
-    mapKernel = {}
 
     @staticmethod
     def detection_starting_locations(corr, pulses, time_res):
@@ -55,7 +55,8 @@ class Detector:
 
     @staticmethod
     def detection_bounding_boxes(output, spectra, time_res, freq_res, lower_freq, upper_freq,
-                                 whistler_model: WhistlerModel, d0_min, d0_max, time_error=1, kernel_even=False):
+                                 whistler_model: WhistlerModel, d0_min, d0_max, time_error=1, kernel_even=False,
+                                 window=1, dtype=None, fft: FFTBackend = None):
         """Location of the whistler after detection
         Params
             ...
@@ -63,23 +64,31 @@ class Detector:
             cafar_params: parameters of the cfar techniques
             threshold:
             time_error: number of decimal places for time onversion
+            window: seconds after the starting point searched for the whistler, at least time_res
+            dtype: floating type of the correlations (e.g. np.float32), None keeps the one of spectra and kernels
+            fft: FFTBackend of the FFT correlations, single-threaded scipy.fft (or pyFFTW) by default
         Return
             bbox: bounding box [x1,x2,y1,y2,c] in time and frequency with c, the result of the correlation
         """
         bboxes = []
+        fft = fft if fft is not None else FFTBackend()
 
         for o in output:
             start = o[0]
-            bbox = np.array([int(start / time_res), int((start + 1) / time_res),
+            bbox = np.array([int(start / time_res), int((start + window) / time_res),
                              int(lower_freq / freq_res), int(upper_freq / freq_res)])
 
             data = spectra[:, bbox[0]:bbox[1]]
+            if dtype is not None:
+                data = np.asarray(data, dtype=dtype)
 
             D0 = np.arange(1, 200 + 1, 1)
             peaks = []
             for d in D0:
 
                 kernel = whistler_model.whistler_sim(An=0.35, D0=d, magnitude=1)
+                if dtype is not None:
+                    kernel = np.asarray(kernel, dtype=dtype)
 
                 if kernel.shape[0] > data.shape[0]:
                     kernel = kernel[:data.shape[0], :]
@@ -90,10 +99,12 @@ class Detector:
                         kernel = kernel[:, :data.shape[1]]
                     else:
                         kernel = np.concatenate(
-                            (kernel, np.zeros((kernel.shape[0], (data.shape[1] - kernel.shape[1])))),
+                            (kernel, np.zeros((kernel.shape[0], (data.shape[1] - kernel.shape[1])),
+                                              dtype=kernel.dtype)),
                             axis=1)
 
-                corr = signal.correlate(data, kernel, mode='valid')[0]
+                with fft.active():
+                    corr = signal.correlate(data, kernel, mode='valid')[0]
                 # if len(corr) > 1:
                 #     print(F"Kernel {d} corr > 1: kernel= {kernel.shape} data= {data.shape} corre={len(corr)}")
 
@@ -116,7 +127,8 @@ class Detector:
         return bboxes
 
     def detection_bounding_boxes_2(self, output, spectra, time_res, freq_res, lower_freq, upper_freq,
-                                   whistlerModel: WhistlerModel, d0_min, d0_max, time_error=1):
+                                   whistlerModel: WhistlerModel, d0_min, d0_max, time_error=1,
+                                   fft: FFTBackend = None):
         """Location of the whistler after detection
         Params
             ...
@@ -124,10 +136,12 @@ class Detector:
             cafar_params: parameters of the cfar techniques
             threshold:
             time_error: number of decimal places for time conversion
+            fft: FFTBackend of the correlations, single-threaded scipy.fft (or pyFFTW) by default
         Return
             bbox: bounding box [x1,x2,y1,y2,c] in time and frequency with c, the result of the correlation
         """
         bboxes = []
+        fft = fft if fft is not None else FFTBackend()
         interval = self.generate_interval(45)
         for o in output:
             start = o[0]
@@ -135,20 +149,16 @@ class Detector:
                              int(lower_freq / freq_res), int(upper_freq / freq_res)])
             data = spectra[bbox[2]:bbox[3], bbox[0]:bbox[1]]
 
-            D0 = self.get_D0_interval(interval, data, whistlerModel)
+            D0 = self.get_D0_interval(interval, data, whistlerModel, fft)
             peaks = []
             for d in D0:
-                d_s = str(d)
-                if d_s in self.mapKernel.keys():
-                    kernel = self.mapKernel[d_s]
-                else:
-                    kernel = whistlerModel.whistler_sim(An=0.35, D0=d, magnitude=1)
-                    self.mapKernel[d_s] = kernel
+                kernel = whistlerModel.whistler_sim(An=0.35, D0=d, magnitude=1)
 
-                corr = signal.correlate(data, kernel[:data.shape[0], :], mode='valid')[0]
+                with fft.active():
+                    corr = signal.correlate(data, kernel[:data.shape[0], :], mode='valid')[0]
                 peaks.append(corr.max())
 
-            duration = self.mapKernel[str(D0[np.argmax(peaks)])].shape[1] * time_res
+            duration = whistlerModel.whistler_sim(An=0.35, D0=D0[np.argmax(peaks)], magnitude=1).shape[1] * time_res
             tmp = (round(start, time_error), round(start + duration, time_error), lower_freq, upper_freq,
                    D0[np.argmax(peaks)], o[1], peaks, D0)
 
@@ -156,18 +166,14 @@ class Detector:
 
         return bboxes, bboxes
 
-    def get_D0_interval(self, interval, data, whistlerModel: WhistlerModel):
+    def get_D0_interval(self, interval, data, whistlerModel: WhistlerModel, fft: FFTBackend = None):
         peaks = []
+        fft = fft if fft is not None else FFTBackend()
         for i in interval:
-            d = i[0]
-            d_s = str(d)
-            if d_s in self.mapKernel.keys():
-                kernel = self.mapKernel[d_s]
-            else:
-                kernel = whistlerModel.whistler_sim(An=0.35, D0=d, magnitude=1)
-                self.mapKernel[d_s] = kernel
+            kernel = whistlerModel.whistler_sim(An=0.35, D0=i[0], magnitude=1)
 
-            corr = signal.correlate(data, kernel[:data.shape[0], :], mode='valid')[0]
+            with fft.active():
+                corr = signal.correlate(data, kernel[:data.shape[0], :], mode='valid')[0]
             peaks.append(corr.max())
 
         i = interval[np.argmax(peaks)]
@@ -1,10 +1,12 @@
 import h5py
 import pandas as pd
-from datetime import timedelta
 import os
+from contextlib import contextmanager
 from itertools import chain
 import numpy as np
-from awds.reader import ReaderInterface, VLFInformation
+from awds.reader import ReaderInterface, VLFInformation, VLFSegment, flat_rows, segment_bounds, split_frame, \
+    utc_time_to_datetime64
+from awds.sidecar import Sidecar
 import math
 
 
@@ -15,7 +17,66 @@ class Debug:
         self.freq = freq
 
 
+class BurstLayout:
+    def __init__(self, orbit_number, sampling_frequency, rows, times, freq, segments=None):
+        self.orbit_number = orbit_number
+        self.sampling_frequency = sampling_frequency
+        # file row of each burst row, and its timestamp
+        self.rows = rows
+        self.times = times
+        self.freq = freq
+        # ((split_seconds, overlap), starts, stops) when already known
+        self.segments = segments
+
+
+class EFDMetadata:
+    def __init__(self, file_name, time, lat, lon, L, burst_intervals, segment_count):
+        self.file_name = file_name
+        self.start = time[0]
+        self.end = time[-1]
+        self.duration = (time[-1] - time[0]) / np.timedelta64(1, 's')
+        # one entry per row of the file
+        self.time = time
+        self.lat = lat
+        self.lon = lon
+        self.L = L
+        # (start, end) of each contiguous run of burst rows
+        self.burst_intervals = burst_intervals
+        self.segment_count = segment_count
+
+
 class EFD(ReaderInterface):
+    # channel -> column holding its burst waveform
+    CHANNELS = {'A131': 'Signal', 'A132': 'X', 'A133': 'Z'}
+    # what AWDS.main analyses
+    DEFAULT_CHANNELS = ('A131',)
+    ROW_COLUMNS = ['GEO_LAT', 'GEO_LON', 'ALTITUDE', 'WORKMODE', 'MAG_LAT', 'MAG_LON']
+    SIDECAR_CHUNK_ROWS = 64
+    COLUMNS = [
+        'DateTime',
+        "OrbitNumber",
+        'Frequency',
+        'GEO_LAT',
+        'GEO_LON',
+        'ALTITUDE',
+        'WORKMODE',
+        'Signal',
+        'X',
+        'Z',
+        'L',
+        'MAG_LAT',
+        'MAG_LON'
+    ]
+
+    def __init__(self, sidecar=False, sidecar_folder=None):
+        """
+        Params
+            sidecar: keep a decoded sidecar next to each file (see awds.sidecar), written on first read and
+                     memory-mapped on the following ones
+            sidecar_folder: where sidecars are written, defaults to the folder of the file
+        """
+        self.sidecar = sidecar
+        self.sidecar_folder = sidecar_folder
 
     def debug(self, path: str, file_name: str) -> Debug:
         full_path = os.path.join(path, file_name)
@@ -99,96 +160,22 @@ class EFD(ReaderInterface):
 
             return Debug(df_p, df_w, FREQ)
 
-    def read(self, path: str, file_name: str, split_seconds: int = 10) -> VLFInformation:
+    def read(self, path: str, file_name: str, split_seconds: int = 10, channels=None) -> VLFInformation:
+        channels = self.check_channels(channels)
         try:
             full_path = os.path.join(path, file_name)
-            with h5py.File(full_path, "r") as f:
-                if 'A131_W' not in list(f.keys()):
-                    return VLFInformation(file_name, "h5", 0, 50000, vlf_signal=None)
-
-                # Read the whole file at onc
-                Workmode = f['WORKMODE'][()][:, 0]
-                UTC_TIME = f['UTC_TIME'][()][:, 0]
-                MAG_LAT = f['MAG_LAT'][()][:, 0]
-                MAG_LON = f['MAG_LON'][()][:, 0]
-                GEO_LAT = f['GEO_LAT'][()][:, 0]
-                GEO_LON = f['GEO_LON'][()][:, 0]
-                ALT = f['ALTITUDE'][()][:, 0]
-                FREQ = f['FREQ'][()][:, 0]
-
-                A131_W = f['A131_W'][()]
-                A132_W = f['A132_W'][()]
-                A133_W = f['A133_W'][()]
-                A131_P = f['A131_P'][()]
-                A132_P = f['A132_P'][()]
-                A133_P = f['A133_P'][()]
-
-                d = [
-                    'DateTime',
-                    "OrbitNumber",
-                    'Frequency',
-                    'GEO_LAT',
-                    'GEO_LON',
-                    'ALTITUDE',
-                    'WORKMODE',
-                    'Signal',
-                    'X',
-                    'Z',
-                    'L',
-                    'MAG_LAT',
-                    'MAG_LON'
-                ]
-                try:
-                    OrbitNumber = file_name.split("_")[6]
-                    sampling_frequency = 51200
-                    listp = []
-                    signal_A131_W = np.array_split(np.asarray(list(chain.from_iterable(A131_W))),
-                                                   int(A131_W.shape[0] * A131_W.shape[1] / sampling_frequency))
-                    signal_A132_W = np.array_split(np.asarray(list(chain.from_iterable(A132_W))),
-                                                   int(A132_W.shape[0] * A132_W.shape[1] / sampling_frequency))
-                    signal_A133_W = np.array_split(np.asarray(list(chain.from_iterable(A133_W))),
-                                                   int(A133_W.shape[0] * A133_W.shape[1] / sampling_frequency))
-                    index = -1
-                    index_s = -1
-                except Exception as e:
-                    print(f"{file_name} Error on signal creations {repr(e)}")
+            with self.open_burst(full_path, file_name, channels, split_seconds) as (layout, frame):
+                if layout is None:
                     return VLFInformation(file_name, "h5", 0, 50000, vlf_signal=None)
 
                 try:
-                    count_workmode = sum(1 for mode in Workmode if mode != 2)
-                    final_range = count_workmode+ len(signal_A131_W) -1
-                    for i in range(final_range):
-                        if Workmode[i] == 2:
-                            index += 1
-
-                        else:
-                            index_s += 1
-
-                        listp.append((UTC_TIME[i], OrbitNumber, 50000, GEO_LAT[i], GEO_LON[i], ALT[i], Workmode[i],
-                                      signal_A131_W[index] if Workmode[i] == 2 else A131_P[index_s],
-                                      signal_A132_W[index] if Workmode[i] == 2 else A132_P[index_s],
-                                      signal_A133_W[index] if Workmode[i] == 2 else A133_P[index_s],
-                                      1 / math.pow(math.cos(math.radians(MAG_LAT[i])), 2), MAG_LAT[i], MAG_LON[i]))
-                except Exception as e:
-                    print(f"{file_name} error: EFD.read = list index out of range {repr(e)}")
-                    return VLFInformation(file_name, "h5", 0, 50000, vlf_signal=None)
-                try:
-                    if len(listp) < 1:
-                        print(f"listp < 1 - {file_name}")
-                        return VLFInformation(file_name, "h5", 0, 50000, vlf_signal=None)
-
-                    df = pd.DataFrame(listp, columns=d)
-                    # convert UTC_TIME in pandas datatime format: YYYYMMDDHHMMSSmsmsms
-                    df['DateTime'] = pd.to_datetime(df['DateTime'],
-                                                    format='%Y%m%d%H%M%S%f',
-                                                    errors='coerce')
-                    df_tmp = df.copy()
-                    # select only burst mode
-                    df = df[df.WORKMODE == 2].reset_index()
+                    df = frame(0, layout.rows.size)
                     print(df.size)
 
-                    vlf = VLFInformation(file_name, "h5", df["L"].values[0], 50000, vlf_signal=df_tmp,
-                                         split=self.split_file(df, split_seconds), other=FREQ)
+                    starts, stops = self.segments(layout, split_seconds)
+                    split = [df.iloc[start:stop] for start, stop in zip(starts, stops)]
+                    vlf = VLFInformation(file_name, "h5", df["L"].values[0], 50000, vlf_signal=df,
+                                         split=split, other=layout.freq)
                 except:
                     print(f"{file_name} error on dataframe creations")
                     vlf = VLFInformation(file_name, "h5", 0, 50000, vlf_signal=None)
@@ -198,19 +185,374 @@ class EFD(ReaderInterface):
 
         return vlf
 
-    def split_file(self, df, seconds, overlap=0):
-        start_time = df.DateTime.loc[0] - timedelta(seconds=overlap)
+    def read_metadata(self, path: str, file_name: str, split_seconds: int = 10) -> EFDMetadata:
+        """Time span, burst intervals, position tracks and number of burst segments of a file, reading only the
+        1-D datasets (no waveform or spectrum is touched).
+        Missing datasets raise KeyError."""
+        full_path = os.path.join(path, file_name)
+        with h5py.File(full_path, "r") as f:
+            time = utc_time_to_datetime64(f['UTC_TIME'][()][:, 0])
+            lat = f['GEO_LAT'][()][:, 0]
+            lon = f['GEO_LON'][()][:, 0]
+            L = 1 / np.cos(np.radians(f['MAG_LAT'][()][:, 0].astype(np.float64))) ** 2
+
+            layout = self.burst_layout(f, file_name)
+            burst_intervals, segment_count = [], 0
+            if layout is not None and layout.rows.size > 0:
+                for start, stop in self.position_runs(layout.rows):
+                    burst_intervals.append((time[start], time[stop - 1]))
+                segment_count = len(segment_bounds(layout.times, split_seconds)[0])
+
+        return EFDMetadata(file_name, time, lat, lon, L, burst_intervals, segment_count)
+
+    def iter_segments(self, path: str, file_name: str, split_seconds: int = 10, first=0, channels=None, overlap=0):
+        """Yield the burst segments of a file one at a time, as the frames of read().split.
+        Only WORKMODE and the burst UTC_TIME rows are read up front, the rows and waveform samples of a segment
+        are read from the open file when it is reached, so memory is bounded by one segment.
+        Params
+            split_seconds: segment length
+            first: index of the first segment to yield
+            channels: channels to load, see read
+            overlap: seconds shared by consecutive segments
+        """
+        channels = self.check_channels(channels)
+        full_path = os.path.join(path, file_name)
+        with self.open_burst(full_path, file_name, channels, split_seconds, overlap) as (layout, frame):
+            if layout is None or layout.rows.size < 1:
+                return
+            starts, stops = self.segments(layout, split_seconds, overlap)
+            for start, stop in zip(starts[first:], stops[first:]):
+                yield frame(start, stop)
+
+    def read_survey(self, path: str, file_name: str, channel='A131', split_seconds: int = 600) -> VLFInformation:
+        """Survey (non-burst) rows of a file with their on-board power spectra, no waveform is read.
+        Segments never straddle a burst window, so the rows of a segment are evenly spaced in time.
+        Params
+            channel: channel whose A13x_P spectra are loaded
+            split_seconds: segment length
+        Return
+            vlf: vlf_signal is the frame of the survey rows, with the spectrum of each row in 'Spectrum',
+                 split the list of its segments and other the FREQ grid in Hz"""
+        self.check_channels([channel])
+        full_path = os.path.join(path, file_name)
+        try:
+            with h5py.File(full_path, "r") as f:
+                Workmode = f['WORKMODE'][()][:, 0]
+                FREQ = f['FREQ'][()][:, 0]
+                P = f[channel + '_P']
+                rows = np.flatnonzero(Workmode != 2)
+                if P.shape[0] == Workmode.size:
+                    # one spectrum per file row
+                    spectra = self.read_spectra(P, self.position_runs(rows))
+                else:
+                    # spectra of the survey rows only, in order
+                    rows = rows[:P.shape[0]]
+                    spectra = P[:rows.size]
+                runs = self.position_runs(rows)
+                MAG_LAT = self.read_rows(f['MAG_LAT'], runs)
+                df = pd.DataFrame({
+                    'index': rows,
+                    'DateTime': utc_time_to_datetime64(self.read_rows(f['UTC_TIME'], runs)).astype('datetime64[ns]'),
+                    'OrbitNumber': file_name.split("_")[6],
+                    'Frequency': 50000,
+                    'GEO_LAT': self.read_rows(f['GEO_LAT'], runs),
+                    'GEO_LON': self.read_rows(f['GEO_LON'], runs),
+                    'ALTITUDE': self.read_rows(f['ALTITUDE'], runs),
+                    'WORKMODE': Workmode[rows],
+                    'Spectrum': self.__row_column(spectra),
+                    'L': 1 / np.cos(np.radians(MAG_LAT.astype(np.float64))) ** 2,
+                    'MAG_LAT': MAG_LAT,
+                    'MAG_LON': self.read_rows(f['MAG_LON'], runs)
+                })
+        except Exception as e:
+            print(f"{file_name} error on survey read {repr(e)}")
+            return VLFInformation(file_name, "h5", 0, 50000, vlf_signal=None)
+
+        if rows.size < 1:
+            return VLFInformation(file_name, "h5", 0, 50000, vlf_signal=df, split=[], other=FREQ)
+
         split = []
-        while True:
-            end_time = start_time + timedelta(seconds=seconds + overlap)
-            mask = (df.DateTime > start_time) & (df.DateTime <= end_time)
-            value = df.loc[mask]
-            if value.size > 0:
-                split.append(value)
-
-            if start_time > df.DateTime.values[-1]:
-                break
-            else:
-                start_time = end_time - timedelta(seconds=overlap)
-
-        return split
+        offset = 0
+        for start, stop in self.position_runs(rows):
+            n = int(stop - start)
+            starts, stops = segment_bounds(df.DateTime.values[offset:offset + n], split_seconds)
+            split += [df.iloc[offset + a:offset + b] for a, b in zip(starts, stops)]
+            offset += n
+        return VLFInformation(file_name, "h5", df["L"].values[0], 50000, vlf_signal=df, split=split, other=FREQ)
+
+    @staticmethod
+    def read_spectra(dataset, runs):
+        """Read the rows of a 2-D spectrum dataset over the given row ranges only."""
+        if not runs:
+            return dataset[0:0]
+        return np.concatenate([dataset[start:stop] for start, stop in runs])
+
+    def iter_vlf_segments(self, path: str, file_name: str, split_seconds: int = 10, first=0, channels=None,
+                          overlap=0):
+        """Yield the burst segments of a file one at a time as VLFSegment, see iter_segments."""
+        channels = self.check_channels(channels)
+        full_path = os.path.join(path, file_name)
+        with self.open_burst(full_path, file_name, channels, split_seconds, overlap) as (layout, frame):
+            if layout is None or layout.rows.size < 1:
+                return
+            starts, stops = self.segments(layout, split_seconds, overlap)
+            for start, stop in zip(starts[first:], stops[first:]):
+                yield frame(start, stop, self.vlf_segment)
+
+    def iter_segment_headers(self, path: str, file_name: str, split_seconds: int = 10, first=0, channels=None,
+                             overlap=0):
+        """Yield the segments of iter_vlf_segments without their signal (signal is None): times, fs and metadata
+        only, e.g. for SpectrogramCache.segment_key, no waveform is read."""
+        channels = self.check_channels(channels)
+        full_path = os.path.join(path, file_name)
+        with self.open_burst(full_path, file_name, channels, split_seconds, overlap) as (layout, frame):
+            if layout is None or layout.rows.size < 1:
+                return
+            starts, stops = self.segments(layout, split_seconds, overlap)
+            for start, stop in zip(starts[first:], stops[first:]):
+                yield frame(start, stop, lambda *args: self.vlf_segment(*args[:-1], waveform=None))
+
+    def check_channels(self, channels):
+        """Channels to load, DEFAULT_CHANNELS when None. Unknown channels raise ValueError."""
+        channels = self.DEFAULT_CHANNELS if channels is None else tuple(channels)
+        unknown = [c for c in channels if c not in self.CHANNELS]
+        if unknown or not channels:
+            raise ValueError(f"channels must be a non-empty subset of {list(self.CHANNELS)}, got {list(channels)}")
+        return channels
+
+    @contextmanager
+    def open_burst(self, full_path, file_name, channels, split_seconds=10, overlap=0):
+        """Open the burst rows of a file, from its sidecar when enabled and valid (writing it on first use).
+        Yield
+            layout: BurstLayout, None if the file cannot be opened or has no usable burst
+            frame: frame(start, stop, build=None) building the frame of burst rows start..stop for the given
+                   channels, with build (segment_frame by default)"""
+        sidecar = self.load_sidecar(full_path, file_name, channels, split_seconds, overlap) if self.sidecar else None
+        if sidecar is not None:
+            layout = self.sidecar_layout(sidecar)
+            yield layout, lambda start, stop, build=None: self.sidecar_frame(sidecar, layout, channels, start, stop,
+                                                                             build)
+            return
+
+        try:
+            f = h5py.File(full_path, "r")
+        except Exception:
+            print(f"{file_name} error on opening")
+            yield None, None
+            return
+
+        with f:
+            layout = self.burst_layout(f, file_name)
+            yield layout, lambda start, stop, build=None: self.burst_frame(f, layout, channels, start, stop, build)
+
+    @staticmethod
+    def segments(layout, split_seconds, overlap=0):
+        """Burst row ranges of the segments, taken from the sidecar index when it was built for the same split."""
+        if layout.segments is not None and layout.segments[0] == (split_seconds, overlap):
+            return layout.segments[1], layout.segments[2]
+        return segment_bounds(layout.times, split_seconds, overlap)
+
+    def load_sidecar(self, full_path, file_name, channels, split_seconds=10, overlap=0):
+        """Loaded sidecar of a file, written first if missing, stale or lacking one of the channels.
+        Return
+            sidecar: Sidecar, None if the file has no usable burst or the sidecar cannot be written"""
+        sidecar = Sidecar(full_path, self.sidecar_folder)
+        try:
+            stored = sidecar.stored()
+            waveforms = [c + '_W' for c in channels]
+            if not set(waveforms) <= stored:
+                with h5py.File(full_path, "r") as f:
+                    layout = self.burst_layout(f, file_name)
+                    if layout is None or layout.rows.size < 1:
+                        return None
+                    # keep what was already stored, a later run may ask for it again
+                    waveforms = sorted(stored.union(waveforms))
+                    self.write_sidecar(f, layout, sidecar, waveforms, split_seconds, overlap)
+            return sidecar.load()
+        except Exception as e:
+            print(f"{file_name} sidecar not available {repr(e)}")
+            return None
+
+    def write_sidecar(self, f, layout, sidecar, waveforms, split_seconds=10, overlap=0):
+        """Store the burst rows of an open file in its sidecar, reading the given A13x_W waveforms
+        SIDECAR_CHUNK_ROWS rows at a time."""
+        runs = self.position_runs(layout.rows)
+        starts, stops = segment_bounds(layout.times, split_seconds, overlap)
+        index = {name: self.read_rows(f[name], runs) for name in self.ROW_COLUMNS}
+        index.update({
+            'orbit_number': np.array(layout.orbit_number),
+            'sampling_frequency': np.array(layout.sampling_frequency),
+            'rows': layout.rows,
+            'times': layout.times,
+            'freq': layout.freq,
+            'segment_split': np.array([split_seconds, overlap], dtype=np.float64),
+            'segment_starts': starts,
+            'segment_stops': stops
+        })
+
+        def chunks(name):
+            for start in range(0, layout.rows.size, self.SIDECAR_CHUNK_ROWS):
+                stop = min(start + self.SIDECAR_CHUNK_ROWS, layout.rows.size)
+                yield self.read_burst_rows(f[name], layout.sampling_frequency, start, stop)
+
+        sidecar.write(index, {name: chunks(name) for name in waveforms})
+
+    @staticmethod
+    def sidecar_layout(sidecar):
+        index = sidecar.index
+        split_seconds, overlap = index['segment_split'].tolist()
+        return BurstLayout(str(index['orbit_number']), int(index['sampling_frequency']), index['rows'],
+                           index['times'], index['freq'],
+                           segments=((split_seconds, overlap), index['segment_starts'], index['segment_stops']))
+
+    def sidecar_frame(self, sidecar, layout, channels, start, stop, build=None):
+        """Frame of the burst rows start..stop served from a loaded sidecar, signals are views on the mapping."""
+        return (build or self.segment_frame)(layout, channels, start, stop,
+                                  lambda name: sidecar.index[name][start:stop],
+                                  lambda name: sidecar.rows(name, start, stop))
+
+    def burst_layout(self, f, file_name):
+        """Locate the burst rows of an open file from WORKMODE and the size of A131_W, without reading signals.
+        Return
+            layout: BurstLayout, None if the file has no usable burst"""
+        if 'A131_W' not in list(f.keys()):
+            return None
+
+        # WORKMODE first: it tells which rows, and how much of the waveform, are needed
+        Workmode = f['WORKMODE'][()][:, 0]
+        FREQ = f['FREQ'][()][:, 0]
+
+        try:
+            OrbitNumber = file_name.split("_")[6]
+            sampling_frequency = 51200
+            sections = self.burst_sections(f['A131_W'].size, sampling_frequency)
+        except Exception as e:
+            print(f"{file_name} Error on signal creations {repr(e)}")
+            return None
+
+        try:
+            count_workmode = int(np.count_nonzero(Workmode != 2))
+            final_range = count_workmode + sections - 1
+            if final_range > Workmode.size:
+                raise IndexError("burst rows exceed WORKMODE rows")
+            rows = np.flatnonzero(Workmode[:final_range] == 2)
+            if rows.size > sections:
+                raise IndexError("burst row without waveform")
+            if final_range < 1:
+                print(f"listp < 1 - {file_name}")
+                return None
+            times = utc_time_to_datetime64(self.read_rows(f['UTC_TIME'], self.position_runs(rows)))
+            times = times.astype('datetime64[ns]')
+        except Exception as e:
+            print(f"{file_name} error: EFD.read = list index out of range {repr(e)}")
+            return None
+
+        return BurstLayout(OrbitNumber, sampling_frequency, rows, times, FREQ)
+
+    def burst_frame(self, f, layout, channels, start, stop, build=None):
+        """Frame of the burst rows start..stop (burst ordinals) of an open file, with the columns of read().vlf_signal.
+        The signal columns hold views on one buffer read with a single hyperslab per channel."""
+        runs = self.position_runs(layout.rows[start:stop])
+        return (build or self.segment_frame)(layout, channels, start, stop,
+                                  lambda name: self.read_rows(f[name], runs),
+                                  lambda name: self.read_burst_rows(f[name], layout.sampling_frequency, start, stop))
+
+    def segment_frame(self, layout, channels, start, stop, column, waveform):
+        """Assemble the frame of burst rows start..stop, with a signal column for each of the channels only.
+        Params
+            column: column(name) -> values of a (rows, 1) dataset for those rows
+            waveform: waveform(name) -> waveform rows of an A13x_W dataset for those rows"""
+        MAG_LAT = column('MAG_LAT')
+        columns = {
+            'index': layout.rows[start:stop],
+            'DateTime': layout.times[start:stop],
+            'OrbitNumber': layout.orbit_number,
+            'Frequency': 50000,
+            'GEO_LAT': column('GEO_LAT'),
+            'GEO_LON': column('GEO_LON'),
+            'ALTITUDE': column('ALTITUDE'),
+            'WORKMODE': column('WORKMODE'),
+            'L': 1 / np.cos(np.radians(MAG_LAT.astype(np.float64))) ** 2,
+            'MAG_LAT': MAG_LAT,
+            'MAG_LON': column('MAG_LON')
+        }
+        for channel in channels:
+            columns[self.CHANNELS[channel]] = self.__row_column(waveform(channel + '_W'))
+        return pd.DataFrame(columns, columns=[c for c in ['index'] + self.COLUMNS if c in columns],
+                            index=np.arange(start, stop))
+
+    def vlf_segment(self, layout, channels, start, stop, column, waveform):
+        """VLFSegment of burst rows start..stop, same parameters as segment_frame. The signal of one channel is the
+        buffer the rows were read into, without copy; with waveform None the segment has no signal."""
+        metadata = {name: column(name)[0] for name in self.ROW_COLUMNS if name != 'MAG_LAT'}
+        MAG_LAT = column('MAG_LAT')
+        metadata.update({'OrbitNumber': layout.orbit_number, 'Frequency': np.int64(50000), 'MAG_LAT': MAG_LAT[0],
+                         'L': (1 / np.cos(np.radians(MAG_LAT.astype(np.float64))) ** 2)[0]})
+        if waveform is None:
+            signal = None
+        else:
+            signals = [flat_rows(waveform(channel + '_W')) for channel in channels]
+            signal = signals[0] if len(signals) == 1 else np.stack(signals)
+        return VLFSegment(signal, metadata['Frequency'],
+                          layout.times[start], layout.times[stop - 1], metadata['L'], metadata['GEO_LAT'],
+                          metadata['GEO_LON'], metadata)
+
+    @staticmethod
+    def burst_sections(size, sampling_frequency):
+        """Number of burst rows packed in an A13x_W dataset of the given size."""
+        sections = int(size / sampling_frequency)
+        if sections < 1:
+            raise ValueError('number sections must be larger than 0.')
+        return sections
+
+    @staticmethod
+    def read_burst_rows(dataset, sampling_frequency, start, stop):
+        """Read only the burst rows start..stop of a packed A13x_W dataset.
+        Params
+            dataset: A13x_W dataset (h5py or numpy)
+            sampling_frequency: samples per burst row
+            start, stop: burst ordinals of the rows needed
+        Return
+            rows: indexable sequence of views on one buffer, row i being the waveform of burst row start + i"""
+        row_size = dataset.shape[1]
+        size = dataset.shape[0] * row_size
+        sections = EFD.burst_sections(size, sampling_frequency)
+        # same boundaries as np.array_split(flat, sections)
+        width, extra = divmod(size, sections)
+        bounds = np.arange(sections + 1) * width + np.minimum(np.arange(sections + 1), extra)
+        first, last = int(bounds[start]), int(bounds[stop])
+        # hyperslab over the packed rows that hold the needed samples
+        packed_start, packed_stop = first // row_size, -(-last // row_size)
+        flat = dataset[packed_start:packed_stop].reshape(-1)
+        flat = flat[first - packed_start * row_size:last - packed_start * row_size]
+        if extra == 0:
+            return flat.reshape(stop - start, width)
+        bounds = bounds[start:stop + 1] - first
+        return [flat[bounds[i]:bounds[i + 1]] for i in range(stop - start)]
+
+    @staticmethod
+    def position_runs(positions):
+        """Contiguous [start, stop) row ranges covering the sorted row positions."""
+        if positions.size == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+        starts = positions[np.concatenate(([0], breaks))]
+        stops = positions[np.concatenate((breaks - 1, [positions.size - 1]))] + 1
+        return list(zip(starts, stops))
+
+    @staticmethod
+    def read_rows(dataset, runs):
+        """Read the first column of a (rows, 1) dataset over the given row ranges only."""
+        if not runs:
+            return dataset[0:0, 0]
+        return np.concatenate([dataset[start:stop, 0] for start, stop in runs])
+
+    @staticmethod
+    def __row_column(rows):
+        column = np.empty(len(rows), dtype=object)
+        for i in range(len(rows)):
+            column[i] = rows[i]
+        return column
+
+    def split_file(self, df, seconds, overlap=0):
+        return split_frame(df, seconds, overlap)
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from awds.reader import first_value
+
 
 class StoreInterface:
     def create_df(self) -> pd.DataFrame:
@@ -14,6 +16,13 @@ class StoreInterface:
         """Load in the file for extracting text."""
         pass
 
+    def add_error_to_df(self, main_df, df, loc, info):
+        """Error row of a segment, with empty metadata when the segment lacks the columns of the store."""
+        try:
+            self.add_info_to_df(main_df, df, loc, info)
+        except KeyError:
+            df.loc[loc] = (None,) * (len(df.columns) - len(info)) + tuple(info)
+
 
 class StoreEFD(StoreInterface):
     def create_df(self) -> pd.DataFrame:
@@ -28,14 +37,14 @@ class StoreEFD(StoreInterface):
         df.loc[loc] = self.information_to_store(main_df) + info
 
     def information_to_store(self, df):
-        OrbitNumber = df["OrbitNumber"].values[0]
-        GeocLat = round(df["GEO_LAT"].values[0], 3)
-        GeocLong = round(df["GEO_LON"].values[0], 3)
-        Altitude = round(df["ALTITUDE"].values[0], 3)
-        Frequency = df["Frequency"].values[0]
-        l = round(df["L"].values[0], 3)
-        MatLat = round(df["MAG_LAT"].values[0], 3)
-        MatLong = round(df["MAG_LON"].values[0], 3)
+        OrbitNumber = first_value(df, "OrbitNumber")
+        GeocLat = round(first_value(df, "GEO_LAT"), 3)
+        GeocLong = round(first_value(df, "GEO_LON"), 3)
+        Altitude = round(first_value(df, "ALTITUDE"), 3)
+        Frequency = first_value(df, "Frequency")
+        l = round(first_value(df, "L"), 3)
+        MatLat = round(first_value(df, "MAG_LAT"), 3)
+        MatLong = round(first_value(df, "MAG_LON"), 3)
 
         return (OrbitNumber, Frequency, GeocLat, GeocLong, Altitude, l, MatLat, MatLong)
 
@@ -55,36 +64,69 @@ class StoreDemeter(StoreInterface):
         df.to_pickle(path)
 
     def add_info_to_df(self, main_df, df, loc, info):
-        df.loc[loc] = self.information_to_store(df) + info
+        df.loc[loc] = self.information_to_store(main_df) + info
 
     def information_to_store(self, df):
-        OrbitNumber = df["OrbitNumber"].values[0]
-        SubOrbitType = df["SubOrbitType"].values[0]
-        GeocLat = round(df["GeocLat"].values[0], 3)
-        GeocLong = round(df["GeocLong"].values[0], 3)
-        Altitude = round(df["Altitude"].values[0], 3)
-        GeomagLat = round(df["GeomagLat"].values[0], 3)
-        GeomagLong = round(df["GeomagLong"].values[0], 3)
-        MLT = round(df["MLT"].values[0], 3)
-        InvLat = round(df["InvLat"].values[0], 3)
-        ConjsatGeocLat = round(df["ConjsatGeocLat"].values[0], 3)
-        ConjsatGeocLong = round(df["ConjsatGeocLong"].values[0], 3)
-        Nconj110GeocLat = round(df["Nconj110GeocLat"].values[0], 3)
-        Nconj110GeocLong = round(df["Nconj110GeocLong"].values[0], 3)
-        Sconj110GeocLat = round(df["Sconj110GeocLat"].values[0], 3)
-        Sconj110GeocLong = round(df["Sconj110GeocLong"].values[0], 3)
-        b_field_x = round(df["b_field_x"].values[0], 3)
-        b_field_y = round(df["b_field_y"].values[0], 3)
-        b_field_z = round(df["b_field_z"].values[0], 3)
-        l = round(df["L"].values[0], 3)
-        GyroFreq = round(df["GyroFreq"].values[0], 3)
-        DataUnit = df["DataUnit"].values[0]
-        Frequency = df["Frequency"].values[0]
-        SampleNumber = df["SampleNumber"].values[0]
-        TotalDuration = df["TotalDuration"].values[0]
-        Nam1c = df["Nam1c"].values[0]
+        OrbitNumber = first_value(df, "OrbitNumber")
+        SubOrbitType = first_value(df, "SubOrbitType")
+        GeocLat = round(first_value(df, "GeocLat"), 3)
+        GeocLong = round(first_value(df, "GeocLong"), 3)
+        Altitude = round(first_value(df, "Altitude"), 3)
+        GeomagLat = round(first_value(df, "GeomagLat"), 3)
+        GeomagLong = round(first_value(df, "GeomagLong"), 3)
+        MLT = round(first_value(df, "MLT"), 3)
+        InvLat = round(first_value(df, "InvLat"), 3)
+        ConjsatGeocLat = round(first_value(df, "ConjsatGeocLat"), 3)
+        ConjsatGeocLong = round(first_value(df, "ConjsatGeocLong"), 3)
+        Nconj110GeocLat = round(first_value(df, "Nconj110GeocLat"), 3)
+        Nconj110GeocLong = round(first_value(df, "Nconj110GeocLong"), 3)
+        Sconj110GeocLat = round(first_value(df, "Sconj110GeocLat"), 3)
+        Sconj110GeocLong = round(first_value(df, "Sconj110GeocLong"), 3)
+        b_field_x = round(first_value(df, "b_field_x"), 3)
+        b_field_y = round(first_value(df, "b_field_y"), 3)
+        b_field_z = round(first_value(df, "b_field_z"), 3)
+        l = round(first_value(df, "L"), 3)
+        GyroFreq = round(first_value(df, "GyroFreq"), 3)
+        DataUnit = first_value(df, "DataUnit")
+        Frequency = first_value(df, "Frequency")
+        SampleNumber = first_value(df, "SampleNumber")
+        TotalDuration = first_value(df, "TotalDuration")
+        Nam1c = first_value(df, "Nam1c")
 
         return (
             OrbitNumber, SubOrbitType, GeocLat, GeocLong, Altitude, GeomagLat, GeomagLong, MLT, InvLat, l,
             ConjsatGeocLat, ConjsatGeocLong, Nconj110GeocLat, Nconj110GeocLong, Sconj110GeocLat, Sconj110GeocLong,
             b_field_x, b_field_y, b_field_z, GyroFreq, DataUnit, Frequency, SampleNumber, TotalDuration, Nam1c)
+
+
+class StoreDemeter1132(StoreInterface):
+    """Store of the Demeter1132 spectra, whose records have the common DEMETER parameters and the spectrum layout
+    (NB, NBF, TOTAL_DUR, FREQ_RES) but none of the waveform header of StoreDemeter."""
+    PARAMS = ["GeocLat", "GeocLong", "Altitude", "GeomagLat", "GeomagLong", "MLT", "InvLat", "L", "ConjsatGeocLat",
+              "ConjsatGeocLong", "Nconj110GeocLat", "Nconj110GeocLong", "Sconj110GeocLat", "Sconj110GeocLong",
+              "b_field_x", "b_field_y", "b_field_z", "GyroFreq"]
+
+    def create_df(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            columns=["OrbitNumber", "SubOrbitType"] + self.PARAMS +
+                    ["DataType", "SpectraNumber", "FrequencyBins", "TotalDuration", "FrequencyResolution",
+                     "Start_Time", "End_Time", "Start_Freq", "End_Freq", "D0_Driver", 'Driver_corr', "D0"])
+
+    def store_df(self, df, path):
+        df.to_pickle(path)
+
+    def add_info_to_df(self, main_df, df, loc, info):
+        df.loc[loc] = self.information_to_store(main_df) + info
+
+    def information_to_store(self, df):
+        OrbitNumber = first_value(df, "OrbitNumber")
+        SubOrbitType = first_value(df, "SubOrbitType")
+        params = tuple(round(first_value(df, name), 3) for name in self.PARAMS)
+        DataType = first_value(df, "DataType")
+        SpectraNumber = first_value(df, "NB")
+        FrequencyBins = first_value(df, "NBF")
+        TotalDuration = first_value(df, "TOTAL_DUR")
+        FrequencyResolution = first_value(df, "FREQ_RES")
+
+        return (OrbitNumber, SubOrbitType) + params + (
+            DataType, SpectraNumber, FrequencyBins, TotalDuration, FrequencyResolution)
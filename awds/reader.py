@@ -1,3 +1,7 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
 from numpy import ndarray
 
 
@@ -13,7 +17,115 @@ class VLFInformation:
         self.other = other
 
 
+class VLFSegment:
+    """One segment of signal as a single contiguous buffer, with the scalar metadata of its first row.
+    signal is (samples,) for one channel and (channel, samples) for several; metadata holds the first-row value of
+    the other columns of the reader frame, by column name, for the stores."""
+    __slots__ = ('signal', 'fs', 't0', 't1', 'L', 'lat', 'lon', 'metadata')
+
+    def __init__(self, signal, fs, t0, t1, L, lat, lon, metadata=None):
+        self.signal = signal
+        self.fs = fs
+        # first and last row timestamps, datetime64[ns]
+        self.t0 = t0
+        self.t1 = t1
+        self.L = L
+        self.lat = lat
+        self.lon = lon
+        self.metadata = metadata if metadata is not None else {}
+
+    @classmethod
+    def from_frame(cls, df, columns=('Signal',)):
+        """Segment of a reader frame whose signal columns hold one array per row, concatenated once."""
+        signals = [flat_rows(df[c].values) for c in columns]
+        metadata = {c: df[c].values[0] for c in df.columns if c not in columns and c != 'DateTime'}
+        lat = next((metadata[c] for c in ('GEO_LAT', 'GeocLat') if c in metadata), None)
+        lon = next((metadata[c] for c in ('GEO_LON', 'GeocLong') if c in metadata), None)
+        return cls(signals[0] if len(signals) == 1 else np.stack(signals), metadata['Frequency'],
+                   df.DateTime.values[0], df.DateTime.values[-1], metadata['L'], lat, lon, metadata)
+
+
+def flat_rows(rows):
+    """Signal rows as one native-endian 1-D buffer, a view when they already are one contiguous 2-D array and at
+    most one copy otherwise (e.g. strided big-endian rows of a record memory map)."""
+    if isinstance(rows, ndarray) and rows.ndim == 2:
+        return rows.astype(rows.dtype.newbyteorder('='), copy=False).reshape(-1)
+    if len(rows) == 0:
+        return np.empty(0, dtype=np.float32)
+    return np.concatenate(list(rows), dtype=rows[0].dtype.newbyteorder('='))
+
+
+def first_value(segment, name):
+    """First-row value of a column of a segment, frame or VLFSegment."""
+    if isinstance(segment, VLFSegment):
+        return segment.metadata[name]
+    return segment[name].values[0]
+
+
 class ReaderInterface:
-    def read(self, path: str, file_name: str, split_seconds: int = 10) -> VLFInformation:
-        """Load in the file for extracting text."""
+    def read(self, path: str, file_name: str, split_seconds: int = 10, channels=None) -> VLFInformation:
+        """Load in the file for extracting text.
+        channels selects the signal channels to decode, None for the reader default."""
         pass
+
+    def iter_segments(self, path: str, file_name: str, split_seconds: int = 10, first=0, channels=None):
+        """Yield the segments of a file one at a time, readers able to stream override it."""
+        vlf = self.read(path, file_name, split_seconds, channels=channels)
+        if vlf.split is not None:
+            yield from vlf.split[first:]
+
+    def iter_vlf_segments(self, path: str, file_name: str, split_seconds: int = 10, first=0, channels=None):
+        """Yield the segments of iter_segments as VLFSegment, readers able to build them directly override it."""
+        for df in self.iter_segments(path, file_name, split_seconds, first, channels=channels):
+            yield VLFSegment.from_frame(df)
+
+
+def segment_bounds(times, seconds, overlap=0):
+    """Row ranges of the time segments used by split_file, found in one pass with searchsorted.
+    Segment k covers (t0 - overlap + k * seconds, t0 + (k + 1) * seconds], t0 being the first timestamp.
+    Params
+        times: sorted timestamps
+        seconds: segment length
+        overlap: seconds shared by consecutive segments
+    Return
+        starts, stops: arrays of [start, stop) row positions, one entry per non-empty segment"""
+    times = np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+    step = pd.Timedelta(timedelta(seconds=seconds)).value
+    shift = pd.Timedelta(timedelta(seconds=overlap)).value
+    first = times[0] - shift
+    edges = first + np.arange((times[-1] - first) // step + 1) * step
+    starts = np.searchsorted(times, edges, side='right')
+    stops = np.searchsorted(times, edges + step + shift, side='right')
+    keep = stops > starts
+    return starts[keep], stops[keep]
+
+
+def split_frame(df, seconds, overlap=0):
+    """Split a frame sorted by DateTime into time segments, as positional slices of df."""
+    starts, stops = segment_bounds(df.DateTime.values, seconds, overlap)
+    return [df.iloc[start:stop] for start, stop in zip(starts, stops)]
+
+
+def utc_time_to_datetime64(utc_time):
+    """Decode UTC_TIME integers (YYYYMMDDHHMMSSmmm, as in CSES files) with integer arithmetic only.
+    Params
+        utc_time: array of UTC_TIME values, any shape
+    Return
+        datetime64[ms] array of the same shape, NaT where a field is out of range"""
+    value = np.asarray(utc_time).astype(np.int64)
+    value, millisecond = np.divmod(value, 1000)
+    value, second = np.divmod(value, 100)
+    value, minute = np.divmod(value, 100)
+    value, hour = np.divmod(value, 100)
+    value, day = np.divmod(value, 100)
+    year, month = np.divmod(value, 100)
+
+    months = ((year - 1970) * 12 + np.clip(month, 1, 12) - 1).astype('datetime64[M]')
+    month_start = months.astype('datetime64[D]')
+    month_days = ((months + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    valid = ((year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days) &
+             (hour < 24) & (minute < 60) & (second < 60))
+
+    time = (month_start + (day - 1).astype('timedelta64[D]')).astype('datetime64[ms]') + \
+           (((hour * 60 + minute) * 60 + second) * 1000 + millisecond).astype('timedelta64[ms]')
+    return np.where(valid, time, np.datetime64('NaT', 'ms'))
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+
+
+class Sidecar:
+    """Decoded copy of a source file kept next to it: a small .npz index and one raw, memory-mappable file per
+    waveform, holding the rows back to back. It is valid as long as the source keeps its size and mtime."""
+    VERSION = 1
+    INDEX_SUFFIX = ".awds.npz"
+
+    def __init__(self, source_path, folder=None):
+        self.source_path = source_path
+        folder = folder if folder is not None else os.path.dirname(source_path)
+        self.index_path = os.path.join(folder, os.path.basename(source_path) + self.INDEX_SUFFIX)
+        self.index = None
+        self.waveforms = {}
+
+    def waveform_path(self, name):
+        return self.index_path[:-len(".npz")] + f".{name}.raw"
+
+    def source_stamp(self):
+        stat = os.stat(self.source_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def is_valid(self):
+        return bool(self.stored())
+
+    def stored(self):
+        """Names of the waveforms held by a valid sidecar, an empty set when missing or stale."""
+        if not os.path.exists(self.index_path):
+            return set()
+        try:
+            with np.load(self.index_path) as index:
+                stamp = (int(index['source_size']), int(index['source_mtime']))
+                names = set(str(name) for name in index['waveforms'])
+                if (int(index['version']) == self.VERSION and stamp == self.source_stamp() and
+                        all(os.path.exists(self.waveform_path(name)) for name in names)):
+                    return names
+        except Exception:
+            pass
+        return set()
+
+    def write(self, index, waveforms):
+        """Write the sidecar, the index last so that an interrupted write is never seen as valid.
+        Params
+            index: dict of arrays to store
+            waveforms: dict name -> iterable of row chunks (2-D arrays or sequences of 1-D rows)"""
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        index = dict(index)
+        size, mtime = self.source_stamp()
+        for name, chunks in waveforms.items():
+            lengths, dtype = [], None
+            tmp_path = self.waveform_path(name) + ".tmp"
+            with open(tmp_path, "wb") as fh:
+                for rows in chunks:
+                    for row in rows:
+                        dtype = row.dtype if dtype is None else dtype
+                        np.ascontiguousarray(row, dtype=dtype).tofile(fh)
+                        lengths.append(row.size)
+            os.replace(tmp_path, self.waveform_path(name))
+            index[name + '_offsets'] = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+            index[name + '_dtype'] = np.array(str(dtype if dtype is not None else np.float32))
+
+        index['waveforms'] = np.array(list(waveforms))
+        index['version'] = np.array(self.VERSION)
+        index['source_size'] = np.array(size)
+        index['source_mtime'] = np.array(mtime)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, **index)
+        os.replace(tmp_path, self.index_path)
+
+    def load(self):
+        """Load the index and map every waveform read-only, no sample is read until it is used."""
+        with np.load(self.index_path) as index:
+            self.index = {key: index[key] for key in index.files}
+        for name in self.index['waveforms']:
+            size = int(self.index[name + '_offsets'][-1])
+            dtype = np.dtype(str(self.index[name + '_dtype']))
+            self.waveforms[name] = np.memmap(self.waveform_path(name), dtype=dtype, mode='r', shape=(size,)) \
+                if size > 0 else np.empty(0, dtype=dtype)
+        return self
+
+    def rows(self, name, start, stop):
+        """Rows start..stop of a stored waveform, as views on the mapping."""
+        flat = self.waveforms[name]
+        offsets = self.index[name + '_offsets']
+        widths = np.diff(offsets[start:stop + 1])
+        if widths.size > 0 and (widths == widths[0]).all():
+            return flat[offsets[start]:offsets[stop]].reshape(stop - start, widths[0])
+        return [flat[offsets[i]:offsets[i + 1]] for i in range(start, stop)]
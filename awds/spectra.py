@@ -1,7 +1,79 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import h5py
 import numpy as np
 import scipy.stats as stats
+from scipy import fft as sp_fft
 from scipy import signal
 
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft as pyfftw_fft
+except ImportError:
+    pyfftw = None
+
+
+class FFTBackend:
+    """FFTs of Spectra and Detector: STFTs, batched rffts and FFT correlations run inside active(), through scipy.fft
+    with `workers` threads per transform, or through pyFFTW (plans cached by its interface) when it is installed.
+    The thread count is given to every transform, no process-wide setting is changed: backends can be used from
+    several threads at once and active() blocks can nest."""
+
+    def __init__(self, workers=1, use_pyfftw=None):
+        """
+        Params
+            workers: threads per transform, -1 for all the cores
+            use_pyfftw: use pyFFTW, None when it is installed"""
+        if use_pyfftw and pyfftw is None:
+            raise ValueError("pyFFTW is not installed")
+        self.workers = workers
+        self.use_pyfftw = pyfftw is not None if use_pyfftw is None else use_pyfftw
+        if self.use_pyfftw:
+            pyfftw.interfaces.cache.enable()
+
+    @property
+    def name(self):
+        return 'pyfftw' if self.use_pyfftw else 'scipy'
+
+    @property
+    def threads(self):
+        """Threads per transform, workers resolved to a count"""
+        return os.cpu_count() if self.workers < 0 else self.workers
+
+    @contextmanager
+    def active(self):
+        """Route the scipy.fft calls of the block (also the ones in scipy.signal) to this backend. Both scipy.fft
+        settings used are local to the calling thread."""
+        with sp_fft.set_workers(self.threads):
+            if not self.use_pyfftw:
+                yield
+                return
+            with sp_fft.set_backend(_PyFFTWWorkers(self.threads)):
+                yield
+
+    def rfft(self, x, n=None, axis=-1):
+        if self.use_pyfftw:
+            return pyfftw_fft.rfft(x, n=n, axis=axis, workers=self.threads)
+        return sp_fft.rfft(x, n=n, axis=axis, workers=self.threads)
+
+
+class _PyFFTWWorkers:
+    """scipy.fft backend forwarding to pyFFTW with the thread count of the backend on each call that gives none,
+    instead of the global pyfftw.config.NUM_THREADS"""
+    __ua_domain__ = "numpy.scipy.fft"
+
+    def __init__(self, threads):
+        self.threads = threads
+
+    def __ua_function__(self, method, args, kwargs):
+        if kwargs.get('workers') is None:
+            kwargs = dict(kwargs, workers=self.threads)
+        return pyfftw_fft.__ua_function__(method, args, kwargs)
+
 
 class Spectra:
     # spectrogram default parameters
@@ -15,13 +87,48 @@ class Spectra:
     __SCALING = 'spectrum'  # Selects between computing the power spectral density (‘density’) where Sxx has units of V**2/Hz and
     # computing the power spectrum (‘spectrum’) where Sxx has units of V**2, if x is measured in V and fs is measured in Hz. Defaults to ‘density’.
     __MODE = 'magnitude'  # Defines what kind of return values are expected. Options are [‘psd’, ‘complex’, ‘magnitude’, ‘angle’, ‘phase’].
+    __WINDOW = ('tukey', .25)  # Desired window to use, scipy.signal.spectrogram default.
+    BATCH_FRAMES = 2048  # frames transformed per rfft call by spectrogram_batch
+    DECIMATION_ATTENUATION = 60  # dB, stopband attenuation of the anti-aliasing filter
+    DECIMATION_TRANSITION = 0.05  # narrowest transition band of the anti-aliasing filter, fraction of Nyquist
+    __FILTERS = {}  # anti-aliasing filters by (factor, passband edge)
+
+    def __init__(self, dtype=None, cache=None, fft=None):
+        """
+        Params
+            dtype: floating type of the signals, spectrograms and correlations (e.g. np.float32), None keeps the
+                   type of the input signal
+            cache: SpectrogramCache used by spectrogram() and spectrogram_batch() when they are given a key
+            fft: FFTBackend of the transforms, single-threaded scipy.fft (or pyFFTW) by default"""
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.cache = cache
+        self.fft = fft if fft is not None else FFTBackend()
+
+    def stft_key(self, sampling_frequency, log10, kHz):
+        """Everything the spectrogram of a signal depends on, besides the signal"""
+        return (self.__WINDOW, self.__NPERSEG, self.__NOVERLAP, self.__NFFT, self.__DETREND, self.__SCALING,
+                self.__MODE, str(self.dtype), float(sampling_frequency), log10, kHz, self.fft.name)
 
-    def spectrogram(self, vlf_signal, sampling_frequency, log10=True, kHz=True):
-        freqs, time, Sxx = signal.spectrogram(vlf_signal, fs=sampling_frequency,
-                                              nperseg=self.__NPERSEG,
-                                              noverlap=self.__NOVERLAP, nfft=self.__NFFT, detrend=self.__DETREND,
-                                              scaling=self.__SCALING,
-                                              mode=self.__MODE)
+    def cast(self, array):
+        """array in the working dtype, not copied when it already is"""
+        return array if self.dtype is None else np.asarray(array, dtype=self.dtype)
+
+    def spectrogram(self, vlf_signal, sampling_frequency, log10=True, kHz=True, key=None):
+        # a stacked (channel, samples) signal gives a (channel, freq, time) spectrogram
+        # with a cache and a key (see SpectrogramCache.segment_key) a spectrogram already computed is not recomputed
+        if self.cache is not None and key is not None:
+            key = (key, self.stft_key(sampling_frequency, log10, kHz))
+            cached = self.cache.get(key)
+            if cached is None:
+                cached = self.cache.put(key, *self.spectrogram(vlf_signal, sampling_frequency, log10, kHz))
+            return cached
+
+        with self.fft.active():
+            freqs, time, Sxx = signal.spectrogram(self.cast(vlf_signal), fs=sampling_frequency,
+                                                  window=self.__WINDOW, nperseg=self.__NPERSEG,
+                                                  noverlap=self.__NOVERLAP, nfft=self.__NFFT, detrend=self.__DETREND,
+                                                  scaling=self.__SCALING,
+                                                  mode=self.__MODE)
 
         if kHz:
             freqs /= 1e3
@@ -30,32 +137,684 @@ class Spectra:
 
         return freqs, time, Sxx
 
+    def cached_spectrogram(self, key, sampling_frequency, log10=True, kHz=True):
+        """(freqs, time, Sxx) that spectrogram() would return for the key from the cache, None when it is not cached"""
+        if self.cache is None:
+            return None
+        return self.cache.get((key, self.stft_key(sampling_frequency, log10, kHz)))
+
+    def spectrogram_batch(self, signals, sampling_frequency, log10=True, kHz=True, keys=None):
+        """Spectrogram of several signals at once, e.g. all the segments of a file. Segments never overlap
+        (noverlap=0, nfft=nperseg), so the frames of every signal are views of shape (frames, nperseg): they are
+        detrended and transformed together, BATCH_FRAMES frames per rfft call, straight into one output array.
+        The output of each signal is the one of spectrogram().
+        Params
+            signals: list of signals, (samples,) or (channel, samples) with the same channels
+            keys: cache keys of the signals, with a cache only the missing spectrograms are computed
+        Return
+            freqs: frequencies
+            spectrograms: list of (time, Sxx) per signal, Sxx being a (freq, time) view on the shared result"""
+        if self.cache is not None and keys is not None:
+            return self.__cached_batch(signals, sampling_frequency, log10, kHz, keys)
+
+        nperseg = self.__NPERSEG
+        signals = [self.cast(signal_) for signal_ in signals]
+        if any(signal_.shape[-1] < nperseg for signal_ in signals) or self.__NOVERLAP != 0 or self.__NFFT != nperseg:
+            # scipy shortens the segment of a short signal, no shared frame layout then
+            results = [self.spectrogram(signal_, sampling_frequency, log10, kHz) for signal_ in signals]
+            return (results[0][0] if results else None), [(time, Sxx) for _, time, Sxx in results]
+
+        counts = [signal_.shape[-1] // nperseg for signal_ in signals]
+        lead = signals[0].shape[:-1] if signals else ()
+        win, scale = self.__window(*signals)
+
+        Sxx = np.empty(lead + (sum(counts), self.__NFFT // 2 + 1), dtype=win.dtype)
+        for index in np.ndindex(lead):
+            frames = [signal_[index][:count * nperseg].reshape(count, nperseg)
+                      for signal_, count in zip(signals, counts)]
+            self.__frames_magnitude(frames, win, scale, Sxx[index])
+        freqs = sp_fft.rfftfreq(self.__NFFT, 1 / sampling_frequency)
+
+        if kHz:
+            freqs /= 1e3
+        if log10:
+            np.log10(Sxx, out=Sxx)
+
+        spectrograms = []
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        for signal_, start, stop in zip(signals, bounds[:-1], bounds[1:]):
+            time = np.arange(nperseg / 2, signal_.shape[-1] - nperseg / 2 + 1, nperseg) / float(sampling_frequency)
+            spectrograms.append((time, Sxx[..., start:stop, :].swapaxes(-1, -2)))
+        return freqs, spectrograms
+
+    def __window(self, *signals):
+        """Real window and magnitude scale of the frames of the signals, in the dtypes of
+        scipy.signal.spectrogram with mode='magnitude', scaling='spectrum'"""
+        outdtype = np.result_type(*signals, np.complex64) if signals else np.dtype(np.complex64)
+        win = signal.get_window(self.__WINDOW, self.__NPERSEG)
+        if np.result_type(win, np.complex64) != outdtype:
+            win = win.astype(outdtype)
+        scale = np.sqrt(1.0 / win.sum() ** 2)
+        # the window is real, multiplying by its real part gives the real part of scipy's complex product
+        return win.real, scale
+
+    def frequencies(self, sampling_frequency, kHz=True):
+        """Frequencies of the spectrogram() bins"""
+        freqs = sp_fft.rfftfreq(self.__NFFT, 1 / sampling_frequency)
+        return freqs / 1e3 if kHz else freqs
+
+    def spectrogram_band(self, vlf_signal, sampling_frequency, lower_freq, upper_freq, log10=True, kHz=True,
+                         key=None, decimation=1):
+        """apply_slice(lower_freq, upper_freq) of spectrogram(), frequencies in kHz when kHz. Only the bins of the
+        band are computed, as a partial DFT (one matrix product) of the detrended and windowed frames, and log10
+        runs on the band only. Equal to the slice of the full spectrogram within float rounding.
+        With decimation > 1 (see decimation_factor) the signal is first decimated (decimate) and transformed with
+        segments decimation times shorter, on the same time and frequency grid: the result then differs from the
+        slice by the anti-aliasing filter response.
+        Return
+            freqs: frequencies of the band
+            time: segment times
+            Sxx: (freq, time) band spectrogram, (channel, freq, time) for a stacked signal"""
+        vlf_signal = self.cast(vlf_signal)
+        nperseg = self.__NPERSEG
+        if vlf_signal.shape[-1] < nperseg or self.__NOVERLAP != 0 or self.__NFFT != nperseg:
+            freqs, time, Sxx = self.spectrogram(vlf_signal, sampling_frequency, log10, kHz, key)
+            Sxx, freqs = self.apply_slice(lower_freq, upper_freq, freqs, Sxx)
+            return freqs, time, Sxx
+
+        freqs = self.frequencies(sampling_frequency, kHz)
+        low, upper = self.band_bins(lower_freq, upper_freq, freqs)
+        if self.cache is not None and key is not None:
+            key = (key, self.stft_key(sampling_frequency, log10, kHz), ('band', low, upper), decimation)
+            cached = self.cache.get(key)
+            if cached is None:
+                cached = self.cache.put(key, *self.spectrogram_band(vlf_signal, sampling_frequency, lower_freq,
+                                                                    upper_freq, log10, kHz, decimation=decimation))
+            return cached
+
+        time = np.arange(nperseg / 2, vlf_signal.shape[-1] - nperseg / 2 + 1, nperseg) / float(sampling_frequency)
+        if decimation > 1:
+            # same frames on a signal decimation times shorter: same time and frequency grid up to its Nyquist
+            high_f = upper_freq * 1e3 if kHz else upper_freq
+            decimated = self.decimate(vlf_signal, sampling_frequency, high_f, decimation)
+            decimated = decimated[..., :vlf_signal.shape[-1] // nperseg * (nperseg // decimation)]
+            with self.fft.active():
+                _, _, Sxx = signal.spectrogram(decimated, fs=sampling_frequency / decimation, window=self.__WINDOW,
+                                               nperseg=nperseg // decimation, noverlap=0, nfft=nperseg // decimation,
+                                               detrend=self.__DETREND, scaling=self.__SCALING, mode=self.__MODE)
+            Sxx = Sxx[..., low:upper, :]
+            return freqs[low:upper], time, np.log10(Sxx) if log10 else Sxx
+
+        win, scale = self.__window(vlf_signal)
+        count = vlf_signal.shape[-1] // nperseg
+        frames = vlf_signal[..., :count * nperseg].reshape(vlf_signal.shape[:-1] + (count, nperseg))
+        # real and imaginary parts of the band bins in one product, the window folded into the DFT matrix;
+        # the 'constant' detrend is linear, the transform of each frame mean is subtracted afterwards
+        bins = np.arange(low, max(low, upper))
+        phase = 2 * np.pi * np.outer(np.arange(nperseg), bins) / self.__NFFT
+        dft = win[:, None] * np.concatenate((np.cos(phase), -np.sin(phase)), axis=1)
+        spectrum = frames @ dft.astype(win.dtype)
+        spectrum -= frames.mean(axis=-1, keepdims=True) * dft.sum(axis=0).astype(win.dtype)
+        np.square(spectrum, out=spectrum)
+        Sxx = spectrum[..., :bins.size] + spectrum[..., bins.size:]
+        np.sqrt(Sxx, out=Sxx)
+        Sxx *= scale.real
+        if log10:
+            np.log10(Sxx, out=Sxx)
+
+        return freqs[low:upper], time, Sxx.swapaxes(-1, -2)
+
+    def decimation_factor(self, high_f, sampling_frequency):
+        """Largest factor, dividing the segment length, that leaves the band up to high_f (Hz) clear of the aliases
+        of the decimated signal with at least DECIMATION_TRANSITION of transition band"""
+        factor = 1
+        while self.__NPERSEG % (2 * factor) == 0 and \
+                self.__transition(2 * factor, high_f, sampling_frequency)[1] >= self.DECIMATION_TRANSITION:
+            factor *= 2
+        return factor
+
+    def decimate(self, vlf_signal, sampling_frequency, high_f, factor):
+        """Polyphase decimation of the signal by factor, the anti-aliasing FIR passing the band up to high_f (Hz)
+        and attenuating by DECIMATION_ATTENUATION what would alias into it"""
+        passband, width = self.__transition(factor, high_f, sampling_frequency)
+        filter_key = (factor, round(passband, 6))
+        if filter_key not in self.__FILTERS:
+            taps, beta = signal.kaiserord(self.DECIMATION_ATTENUATION, width)
+            # odd length, linear phase with an integer delay
+            self.__FILTERS[filter_key] = signal.firwin(taps | 1, passband + width / 2, window=('kaiser', beta))
+        fir = self.__FILTERS[filter_key]
+        return signal.resample_poly(vlf_signal, 1, factor, axis=-1, window=fir).astype(vlf_signal.dtype, copy=False)
+
+    @staticmethod
+    def __transition(factor, high_f, sampling_frequency):
+        """Passband edge and transition width, fractions of the Nyquist frequency, of the anti-aliasing filter: the
+        stopband starts where the aliases of the decimated signal would fold into the band"""
+        nyquist = sampling_frequency / 2
+        passband = high_f / nyquist
+        return passband, (sampling_frequency / factor - high_f) / nyquist - passband
+
+    def __cached_batch(self, signals, sampling_frequency, log10, kHz, keys):
+        stft = self.stft_key(sampling_frequency, log10, kHz)
+        keys = [(key, stft) for key in keys]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            freqs, spectrograms = self.spectrogram_batch([signals[i] for i in missing], sampling_frequency, log10, kHz)
+            for i, (time, Sxx) in zip(missing, spectrograms):
+                # a copy, the view would keep the whole batch result alive in the cache
+                results[i] = self.cache.put(keys[i], freqs, time, np.ascontiguousarray(Sxx))
+        if not results:
+            return None, []
+        return results[0][0], [(time, Sxx) for _, time, Sxx in results]
+
+    def __frames_magnitude(self, frames, win, scale, out):
+        """|rfft(window * detrended frame)| * scale of the rows of a list of (frames, nperseg) arrays, written in
+        order into out, BATCH_FRAMES rows per rfft call so that the work stays in cache"""
+        buffer = np.empty((self.BATCH_FRAMES, win.size), dtype=win.dtype)
+        filled, row = 0, 0
+
+        def flush(n):
+            spectrum = self.fft.rfft(buffer[:n], n=self.__NFFT)
+            spectrum *= scale
+            np.abs(spectrum, out=out[row:row + n])
+
+        for block in frames:
+            start = 0
+            while start < block.shape[0]:
+                n = min(block.shape[0] - start, self.BATCH_FRAMES - filled)
+                part = block[start:start + n]
+                # detrend 'constant' as scipy.signal.detrend, then window
+                np.subtract(part, np.mean(part, -1, keepdims=True), out=buffer[filled:filled + n])
+                buffer[filled:filled + n] *= win
+                filled, start = filled + n, start + n
+                if filled == self.BATCH_FRAMES:
+                    flush(filled)
+                    row, filled = row + filled, 0
+        if filled:
+            flush(filled)
+
     def apply_zscore(self, spectra):
-        for ax in [0, 1]:
+        # (freq, time) or stacked (channel, freq, time)
+        spectra = self.cast(spectra)
+        for ax in [-2, -1]:
             spectra = stats.zscore(spectra, axis=ax)
         return spectra
 
+    def band_bins(self, lower_freq, upper_freq, freqs):
+        """Indices [low, upper) of the bins of the band in freqs"""
+        return int(lower_freq / self.get_freq_res(freqs)), int(upper_freq / self.get_freq_res(freqs))
+
     def apply_slice(self, lower_freq, upper_freq, freqs, spec):
-        low = int(lower_freq / self.get_freq_res(freqs))
-        upper = int(upper_freq / self.get_freq_res(freqs))
-        spec_slice = spec[low:upper, :]
+        low, upper = self.band_bins(lower_freq, upper_freq, freqs)
+        spec_slice = spec[..., low:upper, :]
         freq_slice = freqs[low:upper]
         return spec_slice, freq_slice
 
+    def get_nperseg(self):
+        return self.__NPERSEG
+
     def get_time_res(self, time):
         return time[-1] / len(time)
 
     def get_freq_res(self, freq):
         return freq[-1] / len(freq)
 
-    def get_correlation(self, spectra, kernel, mode='valid', method='fft'):
-        if kernel.shape[0] > spectra.shape[0]:
-            kernel = kernel[:spectra.shape[0], :]
+    def get_correlation(self, spectra, kernel, mode='valid', method='sparse'):
+        """First row of the correlation of the power 10 ** spectra with the kernel, along time.
+        Params
+            method: 'sparse' (matched filter on the non-zero cells of the kernel, see sparse_correlation) or a
+                    scipy.signal.correlate method ('fft', 'direct', 'auto') on the dense kernel"""
+        if kernel.shape[0] > spectra.shape[-2]:
+            kernel = kernel[:spectra.shape[-2], :]
+        if method == 'sparse' and mode == 'valid' and kernel.shape[1] <= spectra.shape[-1]:
+            return self.sparse_correlation(spectra, self.cast(kernel))
+        method = 'fft' if method == 'sparse' else method
+        # a stacked (channel, freq, time) spectra is correlated channel by channel in one call
+        kernel = self.cast(kernel).reshape((1,) * (spectra.ndim - 2) + kernel.shape)
+
+        # the power is a new array already, spectra is left untouched
+        with self.fft.active():
+            return signal.correlate(10 ** self.cast(spectra), kernel, mode=mode, method=method)[..., 0, :]
 
-        return signal.correlate(10 ** np.copy(spectra), kernel, mode=mode, method=method)[0]
+    def sparse_correlation(self, spectra, kernel):
+        """Row 0 of the 'valid' correlation of 10 ** spectra with the kernel, computed on the non-zero cells of the
+        kernel only. A whistler kernel is a one-pixel-wide trace, so the correlation is the weighted sum of the power
+        rows it crosses, each shifted by the time of the trace at that frequency: O(trace length x time) and only the
+        rows under the kernel are exponentiated. Same values as the dense correlation within float rounding.
+        Params
+            spectra: (freq, time) or stacked (channel, freq, time) z-scored log10 spectrogram
+            kernel: (freq, time) kernel, no taller than spectra nor wider than its time axis"""
+        rows, lags = np.nonzero(kernel)
+        length = spectra.shape[-1] - kernel.shape[1] + 1
+        power = 10 ** self.cast(spectra[..., :kernel.shape[0], :])
+        # one (trace cell, time) row per non-zero cell: the power of its frequency shifted by its time
+        windows = np.lib.stride_tricks.sliding_window_view(power, length, axis=-1)
+        trace = windows[..., rows, lags, :]
+        weights = kernel[rows, lags].astype(np.result_type(power, kernel), copy=False)
+        return weights @ trace
 
     def get_time_freq_ratio(self, time, freq, dec=0, integer=True):
         ratio = np.round(time.shape[0] / freq.shape[0], dec)
         if integer:
             ratio = int(ratio)
         return ratio + 1 if ratio % 2 == 0 else ratio
+
+    def write_pyramid(self, segments, path, source_path=None, levels=None, chunk_columns=1024, segment_key=None):
+        """Multi-resolution product of the log10 spectrograms of a file, written once and read by pyramid_tile.
+        Level 0 holds the spectrogram frames of every segment; each next level max-pools pairs of columns of the
+        previous one, within a segment, so a whistler stays visible at any zoom. Levels are chunked, compressed
+        datasets of one HDF5 file, with the column offsets of every segment. Segments are processed one at a time.
+        Params
+            segments: VLFSegments in time order, e.g. EFD.iter_vlf_segments
+            path: HDF5 file to write
+            source_path: file the segments come from, its size and mtime are stored to tell a stale product
+            levels: number of levels, None until the first segment is pooled to a single column
+            segment_key: segment -> cache key of its spectrogram (see SpectrogramCache.segment_key)"""
+        tmp_path = path + ".tmp"
+        with h5py.File(tmp_path, "w") as product:
+            starts, offsets, frame_seconds = [], None, None
+            for segment in segments:
+                key = None if segment_key is None else segment_key(segment)
+                freqs, time, Sxx = self.spectrogram(segment.signal, segment.fs, key=key)
+                if Sxx.ndim > 2:
+                    Sxx = Sxx.max(axis=tuple(range(Sxx.ndim - 2)))
+                if offsets is None:
+                    # same convention as the spectrogram pages: times * 2 from the segment start
+                    frame_seconds = 2 * self.__NPERSEG / float(segment.fs)
+                    levels = levels if levels is not None else int(np.ceil(np.log2(max(Sxx.shape[1], 1)))) + 1
+                    offsets = [[0] for _ in range(levels)]
+                    pending = [[] for _ in range(levels)]
+                    product['freqs'] = freqs
+                    for level in range(levels):
+                        product.create_dataset(f'level_{level}', shape=(freqs.size, 0), maxshape=(freqs.size, None),
+                                               dtype=np.float32, chunks=(freqs.size, chunk_columns),
+                                               compression='lzf')
+                starts.append(np.datetime64(segment.t0, 'ns').astype(np.int64))
+                columns = np.asarray(Sxx, dtype=np.float32)
+                for level in range(levels):
+                    pending[level].append(columns)
+                    offsets[level].append(offsets[level][-1] + columns.shape[1])
+                    self.__flush_level(product[f'level_{level}'], pending[level], chunk_columns)
+                    columns = self.max_pool(columns)
+
+            if offsets is None:
+                raise ValueError("no segment to write")
+            for level in range(levels):
+                self.__flush_level(product[f'level_{level}'], pending[level], 0)
+            product['segment_start'] = np.array(starts, dtype=np.int64)
+            for level in range(levels):
+                product[f'offsets_{level}'] = np.array(offsets[level], dtype=np.int64)
+            product.attrs.update({'levels': levels, 'frame_seconds': frame_seconds})
+            if source_path is not None:
+                stat = os.stat(source_path)
+                product.attrs.update({'source_size': stat.st_size, 'source_mtime': stat.st_mtime_ns})
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def __flush_level(dataset, pending, chunk_columns):
+        """Append the pending columns of a level in whole chunks, so every compressed chunk is written once; with
+        chunk_columns 0 everything left is appended"""
+        size = sum(columns.shape[1] for columns in pending)
+        flush = size if chunk_columns == 0 else size - size % chunk_columns
+        if flush == 0:
+            return
+        columns = np.concatenate(pending, axis=1) if len(pending) > 1 else pending[0]
+        dataset.resize(dataset.shape[1] + flush, axis=1)
+        dataset[:, -flush:] = columns[:, :flush]
+        pending[:] = [columns[:, flush:]] if flush < size else []
+
+    @staticmethod
+    def max_pool(columns):
+        """Max of the pairs of columns, the last one alone when they are odd"""
+        if columns.shape[1] % 2:
+            columns = np.concatenate((columns, columns[:, -1:]), axis=1)
+        return columns.reshape(columns.shape[0], -1, 2).max(axis=2)
+
+    @staticmethod
+    def pyramid_is_current(path, source_path):
+        """Whether the product at path exists and was written from source_path as it is now"""
+        if not os.path.exists(path):
+            return False
+        stat = os.stat(source_path)
+        with h5py.File(path, "r") as product:
+            return (product.attrs.get('source_size'), product.attrs.get('source_mtime')) == \
+                (stat.st_size, stat.st_mtime_ns)
+
+    def pyramid_tile(self, path, start=None, stop=None, level=None, width=None):
+        """Columns of the product of write_pyramid between two times, read at one level: only the chunks of the
+        tile are read, so an orbit overview and a deep zoom both cost the pixels they show.
+        Params
+            start, stop: time range (datetime64), None for the start or the end of the file
+            level: level to read, None for the finest one with at most width columns in the range
+            width: columns wanted, e.g. the pixels on screen, when level is None
+        Return
+            freqs: frequencies
+            times: start time (datetime64[ns]) of every column; columns of different segments are contiguous,
+                   gaps between segments show in times only
+            tile: (freq, column) log10 spectrogram, max over the frames of each column
+            level: level read"""
+        with h5py.File(path, "r") as product:
+            levels = int(product.attrs['levels'])
+            frame = np.int64(round(float(product.attrs['frame_seconds']) * 1e9))
+            segment_start = product['segment_start'][()]
+            offsets = [product[f'offsets_{k}'][()] for k in range(levels)]
+            # range of every segment in frames of level 0
+            start = segment_start[0] if start is None else np.datetime64(start, 'ns').astype(np.int64)
+            stop = segment_start[-1] + np.diff(offsets[0])[-1] * frame if stop is None else \
+                np.datetime64(stop, 'ns').astype(np.int64)
+
+            def columns(k):
+                """(segment, first column, last column) at level k of the segments crossing the range"""
+                step = frame * 2 ** k
+                counts = np.diff(offsets[k])
+                first = np.clip((start - segment_start) // step, 0, counts)
+                last = np.clip(-(-(stop - segment_start) // step), 0, counts)
+                return [(i, f, l) for i, (f, l) in enumerate(zip(first, last)) if l > f]
+
+            if level is None:
+                level = next((k for k in range(levels) if width is None or
+                              sum(l - f for _, f, l in columns(k)) <= width), levels - 1)
+            dataset = product[f'level_{level}']
+            freqs = product['freqs'][()]
+            parts, times = [], []
+            for i, f, l in columns(level):
+                parts.append(dataset[:, offsets[level][i] + f:offsets[level][i] + l])
+                times.append(segment_start[i] + np.arange(f, l) * frame * 2 ** level)
+        tile = np.concatenate(parts, axis=1) if parts else np.empty((freqs.size, 0), dtype=np.float32)
+        times = np.concatenate(times) if times else np.empty(0, dtype=np.int64)
+        return freqs, times.astype('datetime64[ns]'), tile, level
+
+
+class SpectrogramCache:
+    """Spectrograms already computed, shared by the detection and the visualization of a file.
+    Entries are keyed by file, segment and STFT parameters (see Spectra.stft_key) and kept in an in-process LRU
+    within a byte budget; with a folder they are also written there as .npy files, memory-mapped when read back, so
+    that a file processed once is never transformed again. The folder is an LRU too, within its own byte budget:
+    entries of a changed file (new key) are never read again and are the first to go. Cached arrays are read-only."""
+    AXES_SUFFIX = ".axes.npz"
+    DISK_LOW_WATER = 0.9  # fraction of max_disk_bytes the folder is pruned down to
+
+    def __init__(self, max_bytes=256 * 2 ** 20, folder=None, max_disk_bytes=2 * 2 ** 30, max_mapped=256):
+        """
+        Params
+            max_bytes: memory budget of the in-process tier, the least recently used entries are dropped beyond it
+            folder: folder of the on-disk tier, None keeps the cache in memory only
+            max_disk_bytes: size budget of the folder, the least recently used files are removed beyond it
+            max_mapped: entries read back from the folder kept mapped in the in-process tier; they cost no memory
+                        and are not charged to max_bytes, but each holds an open mapping"""
+        self.max_bytes = max_bytes
+        self.folder = folder
+        self.max_disk_bytes = max_disk_bytes
+        self.max_mapped = max_mapped
+        self.nbytes = 0
+        self.disk_bytes = None  # measured on the first write
+        self.hits, self.misses = 0, 0
+        self.__entries = OrderedDict()
+        self.__mapped = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def segment_key(path, file_name, segment, channels=None):
+        """Key of a VLFSegment of a file, stale as soon as the file changes size or modification time."""
+        full_path = os.path.abspath(os.path.join(path, file_name))
+        stat = os.stat(full_path)
+        return (full_path, stat.st_size, stat.st_mtime_ns, None if channels is None else tuple(channels),
+                str(segment.t0), str(segment.t1))
+
+    def get(self, key):
+        """(freqs, time, Sxx) of the key, None when it is not cached"""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            entry = self.__mapped.get(key)
+            if entry is not None:
+                self.__mapped.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            self.__touch(key)
+            return entry
+        entry = self.__load(key)
+        with self.__lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__keep(key, entry)
+        return entry
+
+    def put(self, key, freqs, time, Sxx):
+        """Cache a spectrogram and return it as it will be given back, read-only"""
+        entry = tuple(self.__read_only(array) for array in (freqs, time, Sxx))
+        if self.folder is not None:
+            self.__store(key, entry)
+        with self.__lock:
+            self.__keep(key, entry)
+        return entry
+
+    def clear(self):
+        """Empty the in-process tier, the files of the on-disk one are left"""
+        with self.__lock:
+            self.__entries.clear()
+            self.__mapped.clear()
+            self.nbytes = 0
+
+    def __keep(self, key, entry):
+        if key in self.__entries:
+            self.nbytes -= self.__size(self.__entries.pop(key))
+        self.__mapped.pop(key, None)
+        if isinstance(entry[2], np.memmap):
+            self.__mapped[key] = entry
+            while len(self.__mapped) > self.max_mapped:
+                self.__mapped.popitem(last=False)
+            return
+        size = self.__size(entry)
+        if size > self.max_bytes:
+            return
+        self.__entries[key] = entry
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, dropped = self.__entries.popitem(last=False)
+            self.nbytes -= self.__size(dropped)
+
+    @staticmethod
+    def __size(entry):
+        """Bytes held in memory by an entry, nothing for the arrays mapped from the folder"""
+        return sum(array.nbytes for array in entry if not isinstance(array, np.memmap))
+
+    @staticmethod
+    def __read_only(array):
+        array = np.asarray(array)
+        if array.flags.writeable:
+            array = array.view()
+            array.flags.writeable = False
+        return array
+
+    def __paths(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.folder, name + ".npy"), os.path.join(self.folder, name + self.AXES_SUFFIX)
+
+    def __store(self, key, entry):
+        """Spectrogram first and axes last, the axes file marks a complete entry"""
+        freqs, time, Sxx = entry
+        os.makedirs(self.folder, exist_ok=True)
+        written = 0
+        for path, write in zip(self.__paths(key), (lambda fh: np.save(fh, Sxx),
+                                                   lambda fh: np.savez(fh, key=repr(key), freqs=freqs, time=time))):
+            with open(path + ".tmp", "wb") as fh:
+                write(fh)
+                written += fh.tell()
+            os.replace(path + ".tmp", path)
+        with self.__lock:
+            self.disk_bytes = self.__disk_usage()[1] if self.disk_bytes is None else self.disk_bytes + written
+            if self.disk_bytes > self.max_disk_bytes:
+                self.__prune()
+
+    def __disk_usage(self):
+        """Entries of the folder as (last use, spectrogram path, axes path, bytes), and their total bytes"""
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(self.AXES_SUFFIX):
+                continue
+            axes_path = os.path.join(self.folder, name)
+            spectrogram_path = axes_path[:-len(self.AXES_SUFFIX)] + ".npy"
+            try:
+                axes = os.stat(axes_path)
+                size = axes.st_size + (os.path.getsize(spectrogram_path) if os.path.exists(spectrogram_path) else 0)
+            except OSError:
+                continue
+            entries.append((axes.st_mtime_ns, spectrogram_path, axes_path, size))
+        return entries, sum(entry[3] for entry in entries)
+
+    def __prune(self):
+        """Remove the least recently used entries of the folder down to DISK_LOW_WATER of its budget. Entries
+        whose spectrogram is still mapped (removal refused on Windows) are skipped."""
+        entries, self.disk_bytes = self.__disk_usage()
+        for _, spectrogram_path, axes_path, size in sorted(entries):
+            if self.disk_bytes <= self.max_disk_bytes * self.DISK_LOW_WATER:
+                break
+            try:
+                # spectrogram first: an axes file left alone is a miss, and is removed by the next pruning
+                if os.path.exists(spectrogram_path):
+                    os.remove(spectrogram_path)
+                os.remove(axes_path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+
+    def __load(self, key):
+        if self.folder is None:
+            return None
+        spectrogram_path, axes_path = self.__paths(key)
+        if not os.path.exists(axes_path):
+            return None
+        try:
+            with np.load(axes_path) as axes:
+                if str(axes['key']) != repr(key):
+                    return None
+                freqs, time = axes['freqs'], axes['time']
+            Sxx = np.load(spectrogram_path, mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return None
+        self.__touch(key)
+        return self.__read_only(freqs), self.__read_only(time), Sxx
+
+    def __touch(self, key):
+        """Mark the last use of an entry of the folder, for its pruning"""
+        try:
+            os.utime(self.__paths(key)[1])
+        except OSError:
+            pass
+
+
+class StreamingSpectrogram:
+    """Band spectrogram of an unbounded sample stream, normalized frame by frame at fixed memory.
+    Samples are pushed in chunks of any size; every complete frame is transformed as in Spectra.spectrogram_band and
+    normalized as in Spectra.apply_zscore, except that the statistics along time are running ones: over the last
+    `frames` frames ('window') or exponentially weighted with a span of `frames` frames ('ewm'). Frames are emitted
+    as soon as they are complete, the state is a partial frame and at most `frames` band frames."""
+    MODES = ('window', 'ewm')
+
+    def __init__(self, sampling_frequency, lower_freq, upper_freq, frames=2000, mode='window', spectra=None,
+                 kHz=True):
+        """
+        Params
+            lower_freq, upper_freq: band, in kHz when kHz
+            frames: frames of the running statistics, window length or span of the exponential weights
+            mode: 'window' or 'ewm'
+            spectra: Spectra doing the transform (dtype, FFT backend), a default one when None"""
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {list(self.MODES)}, got {mode}")
+        self.sampling_frequency = sampling_frequency
+        self.lower_freq, self.upper_freq, self.kHz = lower_freq, upper_freq, kHz
+        self.frames, self.mode = frames, mode
+        self.spectra = spectra if spectra is not None else Spectra()
+        self.nperseg = self.spectra.get_nperseg()
+        freqs = self.spectra.frequencies(sampling_frequency, kHz)
+        low, upper = self.spectra.band_bins(lower_freq, upper_freq, freqs)
+        self.freqs = freqs[low:upper]
+        self.emitted = 0
+        self.__pending = None
+        self.__history = None  # 'window': ring of the last frames frames
+        self.__sums = None  # 'window': float64 sums of the ring frames and of their squares
+        self.__since_sync = 0  # 'window': frames added to the sums since they were last recomputed
+        self.__state = None  # 'ewm': lfilter state of the weighted sums
+
+    def push(self, samples):
+        """Add samples, (samples,) or (channel, samples), to the stream.
+        Return
+            time: times of the frames completed by these samples, from the start of the stream
+            Sxx: their normalized band spectrogram, (freq, time) or (channel, freq, time)"""
+        samples = self.spectra.cast(np.asarray(samples))
+        if self.__pending is not None:
+            samples = np.concatenate((self.__pending, samples), axis=-1)
+        count = samples.shape[-1] // self.nperseg
+        self.__pending = samples[..., count * self.nperseg:].copy()
+        if count == 0:
+            dtype = np.result_type(samples.dtype, np.float32)
+            return np.empty(0), np.empty(samples.shape[:-1] + (self.freqs.size, 0), dtype=dtype)
+
+        _, _, Sxx = self.spectra.spectrogram_band(samples[..., :count * self.nperseg], self.sampling_frequency,
+                                                  self.lower_freq, self.upper_freq, kHz=self.kHz)
+        # along frequency each frame is normalized on its own, exactly as apply_zscore
+        Sxx = stats.zscore(Sxx, axis=-2)
+        mean, std = self.__window(Sxx) if self.mode == 'window' else self.__ewm(Sxx)
+        Sxx = np.divide(Sxx - mean, std, out=np.zeros_like(Sxx), where=std > 0)
+
+        time = ((self.emitted + np.arange(count)) * self.nperseg + self.nperseg / 2) / float(self.sampling_frequency)
+        self.emitted += count
+        return time, Sxx
+
+    def __window(self, Sxx):
+        """Mean and standard deviation of every new frame over itself and the frames - 1 before it, from running
+        float64 sums: each frame adds itself and subtracts the frame leaving the window, kept in a ring of the last
+        frames frames. The sums are recomputed from the ring once per frames frames, so rounding cannot drift."""
+        if self.__history is None:
+            # frame-major, so that a frame is contiguous
+            self.__history = np.zeros((self.frames,) + Sxx.shape[:-1], dtype=Sxx.dtype)
+            self.__sums = np.zeros((2,) + Sxx.shape[:-1])
+        means, stds = [], []
+        for first in range(0, Sxx.shape[-1], self.frames):
+            mean, std = self.__window_chunk(Sxx[..., first:first + self.frames], self.emitted + first)
+            means.append(mean)
+            stds.append(std)
+        return np.concatenate(means, axis=-1), np.concatenate(stds, axis=-1)
+
+    def __window_chunk(self, Sxx, start):
+        """__window of at most frames new frames, the first being frame start of the stream: the frames leaving the
+        window are then all in the ring"""
+        count = Sxx.shape[-1]
+        index = start + np.arange(count)
+        values = Sxx.astype(np.float64)
+        leaving = np.moveaxis(self.__history[index % self.frames], 0, -1).astype(np.float64)
+        leaving[..., index < self.frames] = 0
+        sums = self.__sums[..., None] + np.cumsum(np.stack((values, np.square(values))), axis=-1) - \
+            np.cumsum(np.stack((leaving, np.square(leaving))), axis=-1)
+        n = np.minimum(index + 1, self.frames)
+        mean = sums[0] / n
+        var = sums[1] / n - mean ** 2
+
+        self.__history[index % self.frames] = np.moveaxis(Sxx, -1, 0)
+        self.__since_sync += count
+        if self.__since_sync >= self.frames:
+            history = self.__history.astype(np.float64)
+            self.__sums = np.stack((history.sum(axis=0), np.square(history).sum(axis=0)))
+            self.__since_sync = 0
+        else:
+            self.__sums = sums[..., -1]
+        return mean, np.sqrt(np.maximum(var, 0))
+
+    def __ewm(self, Sxx):
+        """Exponentially weighted mean and standard deviation, span frames, up to every new frame. The weights are
+        normalized by their sum (pandas ewm adjust=True), so the first frames are not biased towards the start."""
+        alpha = 2 / (self.frames + 1)
+        values = Sxx.astype(np.float64)
+        # weighted sums of the frames, of their squares and of the weights, one first order filter each
+        stacked = np.stack((values, values ** 2, np.ones_like(values)))
+        if self.__state is None:
+            self.__state = np.zeros(stacked.shape[:-1] + (1,))
+        sums, self.__state = signal.lfilter([1], [1, alpha - 1], stacked, axis=-1, zi=self.__state)
+        mean, squares = sums[0] / sums[2], sums[1] / sums[2]
+        return mean, np.sqrt(np.maximum(squares - mean ** 2, 0))
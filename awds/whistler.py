@@ -1,16 +1,71 @@
+import threading
+from collections import OrderedDict
+
 import numpy as np
 
 
+class KernelBank:
+    """Whistler kernels shared by every WhistlerModel of the process.
+    Entries are keyed by (t_res, f_res, low_f, high_f, fn, An, D0), with magnitude and dtype, simulated the first time
+    they are asked for and kept in an LRU within a byte budget, so the same kernel is never simulated twice for the
+    segments and detections of a run. Kernels are read-only."""
+
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        """
+        Params
+            max_bytes: memory budget, the least recently used kernels are dropped beyond it"""
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits, self.misses = 0, 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, simulate):
+        """Kernel of the key, simulate() is called and its result kept when it is not in the bank"""
+        with self.__lock:
+            kernel = self.__entries.get(key)
+            if kernel is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return kernel
+            self.misses += 1
+        kernel = simulate()
+        kernel.flags.writeable = False
+        with self.__lock:
+            if key not in self.__entries:
+                self.__entries[key] = kernel
+                self.nbytes += kernel.nbytes
+            while self.nbytes > self.max_bytes and len(self.__entries) > 1:
+                self.nbytes -= self.__entries.popitem(last=False)[1].nbytes
+        return kernel
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+KERNEL_BANK = KernelBank()
+
+
 class WhistlerModel:
 
-    def __init__(self, t_res, f_res, low_f, high_f, fn):
+    def __init__(self, t_res, f_res, low_f, high_f, fn, dtype=np.float64, bank=None):
+        """Kernels are simulated on demand and shared through the bank, building a model costs nothing.
+        Params
+            dtype: floating type of the kernels
+            bank: KernelBank of the kernels, the process-wide KERNEL_BANK by default"""
+        self.dtype = np.dtype(np.float64 if dtype is None else dtype)
+        self.bank = bank if bank is not None else KERNEL_BANK
         self.__f_res = f_res
         self.__t_res = t_res
+        self.__low_f = low_f
+        self.__high_f = high_f
         self.__f = np.linspace(low_f, high_f, 1000)
         self.__fn = fn
-        self.mapW = {}
-        for d in np.concatenate(( np.arange(1, 101, 1), np.arange(100, 201, 1))):
-            self.whistler_sim(d)
 
     def whistler_trace(self, An, D0):
         """generate the whistler trace
@@ -35,17 +90,13 @@ class WhistlerModel:
             f: frequency range
         return
             t: time range"""
+        key = (self.__t_res, self.__f_res, self.__low_f, self.__high_f, self.__fn, An, D0, magnitude, self.dtype.str)
+        return self.bank.get(key, lambda: self.__simulate(D0, An, magnitude))
 
-        d_s = str(D0)
-        if d_s in self.mapW.keys():
-            return self.mapW[d_s]
-        else:
-            t = self.whistler_trace(An=An, D0=D0)
-            t_trans, f_trans = (t - t.min()) / self.__t_res, (self.__f - self.__f.min()) * 1e-3 / self.__f_res
-            t_trans, f_trans = t_trans.astype(int), f_trans.astype(int)
-            coor = np.array([(t, f) for t, f in zip(t_trans, f_trans)])
-            data = np.zeros((t_trans.max() + 1, f_trans.max() + 1))
-            for x, y in coor:
-                data[x, y] = magnitude
-            self.mapW[d_s] = data.T
-            return self.mapW[d_s]
+    def __simulate(self, D0, An, magnitude):
+        t = self.whistler_trace(An=An, D0=D0)
+        t_trans, f_trans = (t - t.min()) / self.__t_res, (self.__f - self.__f.min()) * 1e-3 / self.__f_res
+        t_trans, f_trans = t_trans.astype(int), f_trans.astype(int)
+        data = np.zeros((t_trans.max() + 1, f_trans.max() + 1), dtype=self.dtype)
+        data[t_trans, f_trans] = magnitude
+        return data.T
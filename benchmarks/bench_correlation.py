@@ -0,0 +1,51 @@
+"""Sparse-trace matched filter (Spectra.get_correlation, method='sparse') against the dense scipy.signal.correlate
+paths on the z-scored whistler band of 10 s segments, for kernels of several D0.
+
+    python -m benchmarks.bench_correlation [n_segments]
+"""
+import sys
+import time
+
+import numpy as np
+
+from awds.spectra import Spectra
+from awds.whistler import WhistlerModel
+from benchmarks.synthetic import SAMPLING_FREQUENCY
+
+
+def timed(func, *args, repeat=5):
+    func(*args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(n_segments=20):
+    rng = np.random.default_rng(0)
+    spectra = Spectra()
+    slices = []
+    for _ in range(n_segments):
+        freqs, t, spectrogram = spectra.spectrogram(rng.standard_normal(10 * SAMPLING_FREQUENCY, dtype=np.float32),
+                                                    SAMPLING_FREQUENCY)
+        slices.append(spectra.apply_zscore(spectra.apply_slice(4.5, 11.5, freqs, spectrogram)[0]))
+    t_res, f_res = spectra.get_time_res(t * 2), spectra.get_freq_res(freqs)
+    model = WhistlerModel(t_res, f_res, 4.5e3, 11.5e3, 25e3)
+    print(f"{n_segments} segments, band {slices[0].shape[0]} bins x {slices[0].shape[1]} frames")
+
+    for d0 in (10, 50, 100, 200):
+        kernel = model.whistler_sim(d0)
+        results = {}
+        for method in ('fft', 'direct', 'sparse'):
+            results[method] = timed(lambda: [spectra.get_correlation(s, kernel, method=method) for s in slices])
+        sparse = results['sparse'][0]
+        assert all(np.array_equal(a, b) for a, b in zip(results['direct'][0], sparse))
+        error = max(np.abs(a - b).max() / np.abs(a).max() for a, b in zip(results['fft'][0], sparse))
+        print(f"D0 {d0:3d}, kernel {kernel.shape[0]}x{kernel.shape[1]} ({np.count_nonzero(kernel)} cells): "
+              f"fft {results['fft'][1] * 1e3:7.1f} ms, direct {results['direct'][1] * 1e3:7.1f} ms, "
+              f"sparse {results['sparse'][1] * 1e3:6.1f} ms, {results['fft'][1] / results['sparse'][1]:.0f}x "
+              f"over fft; equal to direct, max relative difference to fft {error:.1e}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
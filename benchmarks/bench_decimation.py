@@ -0,0 +1,79 @@
+"""Decimated spectrogram (AWDS.main(decimate=True)) against the full and the band-limited one on a synthetic orbit
+with injected whistlers: time spent in the spectrogram, its size and the detections that change against the full
+spectrogram. Fails when more detections change than DETECTION_TOLERANCE allows; the cost is only reported, the
+decimated path is not expected to beat the band-limited one.
+
+    python -m benchmarks.bench_decimation [n_rows] [whistlers]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+from contextlib import redirect_stdout
+from io import StringIO
+
+import pandas as pd
+
+import awds.awds_with_persistence as awds_module
+from awds.awds_with_persistence import AWDS
+from awds.efd import EFD
+from awds.persistence import StoreEFD
+from awds.spectra import Spectra
+from benchmarks.synthetic import write_efd_file
+
+MODES = {'full': {}, 'band': {'band_limited': True}, 'decimated': {'decimate': True}}
+DETECTION_TOLERANCE = 0.9  # least fraction of the detections left unchanged by the decimation
+
+
+def main(n_rows=600, whistlers=40):
+    with tempfile.TemporaryDirectory() as folder:
+        full_path = write_efd_file(folder, n_rows, whistlers=whistlers)
+        file_name = os.path.basename(full_path)
+        segments = list(EFD().iter_vlf_segments(folder, file_name))
+        print(f"{len(segments)} burst segments, {whistlers} injected whistlers")
+
+        results, costs = {}, {}
+        for mode, options in MODES.items():
+            awds_module.PKL_FOLDER = os.path.join(folder, mode)
+            with redirect_stdout(StringIO()), warnings.catch_warnings():
+                # the float64 bounding-box correlation warns on segments without detections
+                warnings.simplefilter('ignore', RuntimeWarning)
+                AWDS().main(EFD(), StoreEFD(), folder, file_name, **options)
+            frame = pd.read_pickle(os.path.join(awds_module.PKL_FOLDER, os.path.splitext(file_name)[0] + ".pkl"))
+            results[mode] = set(map(tuple, frame[frame.D0 > 0][['Start_Time', 'End_Time', 'D0']].values))
+            costs[mode] = spectrogram_cost(segments, options)
+            print(f"{mode:9s}: spectrogram {costs[mode][0]:6.3f} s, {costs[mode][1] / 2 ** 20:6.1f} MiB, "
+                  f"{len(results[mode])} detections")
+
+    reference, decimated = results['full'], results['decimated']
+    unchanged = len(reference & decimated) / max(1, len(reference | decimated))
+    print(f"decimated: {costs['decimated'][0] / costs['band'][0]:.1f}x the band-limited time, "
+          f"{costs['decimated'][0] / costs['full'][0]:.1f}x the full one, {unchanged:.1%} detections unchanged "
+          f"({len(reference - decimated)} lost, {len(decimated - reference)} new)")
+    assert unchanged >= DETECTION_TOLERANCE, \
+        f"decimation changed more than {1 - DETECTION_TOLERANCE:.0%} of the detections"
+
+
+def spectrogram_cost(segments, options, repeat=3):
+    """Best seconds over repeat runs and bytes of the spectrograms of the segments, as AWDS.main computes them"""
+    spectra, best, size = Spectra(), float('inf'), 0
+    for _ in range(repeat):
+        elapsed, size = 0.0, 0
+        for segment in segments:
+            low_f, high_f = awds_module.get_value_base_on_l(segment.L)[:2]
+            start = time.perf_counter()
+            if options:
+                factor = spectra.decimation_factor(high_f, segment.fs) if options.get('decimate') else 1
+                _, _, Sxx = spectra.spectrogram_band(segment.signal, segment.fs, low_f / 1e3, high_f / 1e3,
+                                                     decimation=factor)
+            else:
+                _, _, Sxx = spectra.spectrogram(segment.signal, segment.fs)
+            elapsed += time.perf_counter() - start
+            size += Sxx.nbytes
+        best = min(best, elapsed)
+    return best, size
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""Memory-mapped structured-dtype Demeter1131 decode against the original struct/strptime loop, and the
+vectorized Demeter1138 analysis frame against the original record-by-record one.
+
+    python -m benchmarks.bench_demeter [n_records]
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from awds.demeter import Demeter1131, Demeter1138
+from benchmarks import legacy
+from benchmarks.synthetic import write_demeter_1131_file, write_demeter_1138_file
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10s}{elapsed:8.3f} s")
+    return result, elapsed
+
+
+def main(n_records=2000):
+    with tempfile.TemporaryDirectory() as folder:
+        full_path = write_demeter_1131_file(folder, n_records)
+        print(f"{os.path.basename(full_path)}: {os.path.getsize(full_path) / 2 ** 20:.0f} MiB, {n_records} records")
+
+        old, old_time = timed("legacy", legacy.demeter_1131_frame, full_path)
+        new, new_time = timed("memmap", Demeter1131().read_df, folder + os.sep, os.path.basename(full_path))
+
+        # the legacy path parses the millisecond field with %f, which is only right for 3 digit values
+        three_digits = new.DateTime.dt.microsecond.values >= 100000
+        assert (old.DateTime.values[three_digits] == new.DateTime.values[three_digits]).all()
+        pd.testing.assert_frame_equal(old.drop(columns=['DateTime', 'Signal']), new.drop(columns=['DateTime', 'Signal']),
+                                      check_dtype=False)
+        assert all(np.array_equal(a, b) for a, b in zip(old.Signal.values, new.Signal.values))
+        print(f"speedup {old_time / new_time:6.1f}x")
+
+        full_path = write_demeter_1138_file(folder, n_records)
+        df = Demeter1138().read(folder + os.sep, os.path.basename(full_path))
+        print(f"{os.path.basename(full_path)}: {n_records} records")
+        old, old_time = timed("legacy", legacy.demeter_1138_analysis, df)
+        new, new_time = timed("vector", Demeter1138().make_df_for_analysis, df)
+        pd.testing.assert_frame_equal(old, new, check_dtype=False)
+        print(f"speedup {old_time / new_time:6.1f}x")
+
+        Demeter1138().save_analysis(df, os.path.join(folder, "analysis.npz"))
+        loaded = Demeter1138().load_analysis(os.path.join(folder, "analysis.npz"))
+        pd.testing.assert_frame_equal(new, loaded)
+        print(f"analysis.npz {os.path.getsize(os.path.join(folder, 'analysis.npz')) / 2 ** 20:.1f} MiB, "
+              f"pickled frame {len(pickle.dumps(old)) / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
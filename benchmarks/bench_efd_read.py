@@ -0,0 +1,55 @@
+"""Columnar, burst-only EFD.read against the original row-by-row decode on an orbit-sized synthetic file.
+
+    python -m benchmarks.bench_efd_read [n_rows] [burst_fraction]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+
+from awds.efd import EFD
+from benchmarks import legacy
+from benchmarks.synthetic import write_efd_file
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(n_rows=1050, burst_fraction=0.3):
+    with tempfile.TemporaryDirectory() as folder:
+        full_path = write_efd_file(folder, n_rows, burst_fraction)
+        file_name = os.path.basename(full_path)
+        print(f"{file_name}: {os.path.getsize(full_path) / 2 ** 20:.0f} MiB, {n_rows} rows")
+
+        old, old_time, old_peak = measure(legacy.efd_read_frame, full_path, file_name)
+        vlf, new_time, new_peak = measure(EFD().read, folder, file_name)
+        _, all_time, all_peak = measure(EFD().read, folder, file_name, 10, tuple(EFD.CHANNELS))
+
+        old = old[old.WORKMODE == 2]
+        new = vlf.vlf_signal
+        assert len(old) == len(new)
+        assert (old.DateTime.values == new.DateTime.values).all()
+        assert np.allclose(old.L.values, new.L.values)
+        assert all(np.array_equal(a, b) for a, b in zip(old.Signal.values, new.Signal.values))
+
+        print(f"legacy   : {old_time:7.2f} s  peak {old_peak / 2 ** 20:7.0f} MiB")
+        print(f"columnar : {new_time:7.2f} s  peak {new_peak / 2 ** 20:7.0f} MiB  (A131 only)")
+        print(f"3 channel: {all_time:7.2f} s  peak {all_peak / 2 ** 20:7.0f} MiB  (A131, A132, A133)")
+        print(f"speedup  : {old_time / new_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main(*[float(a) if "." in a else int(a) for a in sys.argv[1:]])
@@ -0,0 +1,41 @@
+"""Whistler kernels of AWDS.detect: the original WhistlerModel, simulating 301 kernels per segment, against the
+process-wide KernelBank, over the segments of an orbit cycling through the L bands of get_value_base_on_l.
+
+    python -m benchmarks.bench_kernels [n_segments]
+"""
+import sys
+import time
+
+import numpy as np
+
+from awds.awds_with_persistence import get_value_base_on_l
+from awds.whistler import KERNEL_BANK, WhistlerModel
+from benchmarks.legacy import whistler_model_kernels
+
+T_RES, F_RES = 2 * 256 / 50000, 50000 / 256 / 1e3
+L_VALUES = (1.2, 1.8, 2.8, 4.0)
+
+
+def main(n_segments=100):
+    bands = [get_value_base_on_l(L_VALUES[i % len(L_VALUES)])[:3] for i in range(n_segments)]
+
+    start = time.perf_counter()
+    legacy = [whistler_model_kernels(T_RES, F_RES, *band) for band in bands[:len(L_VALUES)]]
+    per_segment = (time.perf_counter() - start) / len(L_VALUES)
+
+    KERNEL_BANK.clear()
+    start = time.perf_counter()
+    for band in bands:
+        model = WhistlerModel(T_RES, F_RES, *band)
+        kernels = [model.whistler_sim(d) for d in range(1, 201)]
+    bank = time.perf_counter() - start
+
+    assert all(np.array_equal(model.whistler_sim(d), kernels[str(d)]) for band, kernels in zip(bands, legacy)
+               for model in [WhistlerModel(T_RES, F_RES, *band)] for d in range(1, 201))
+    print(f"{n_segments} segments, {len(L_VALUES)} L bands: original {per_segment * n_segments:.2f} s "
+          f"({per_segment * 1e3:.0f} ms per segment), bank {bank:.3f} s with {len(KERNEL_BANK)} kernels "
+          f"({KERNEL_BANK.nbytes / 2 ** 20:.1f} MiB); kernels equal")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,65 @@
+"""float32 against the default float64 detection chain (AWDS.detect) on the burst segments of a synthetic orbit with
+injected whistlers: detection agreement, correlation error and time.
+
+    python -m benchmarks.bench_precision [n_rows] [whistlers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from awds.awds_with_persistence import AWDS
+from awds.efd import EFD
+from awds.spectra import Spectra
+from awds.whistler import WhistlerModel
+from benchmarks.synthetic import write_efd_file
+
+
+def detections(segments, dtype):
+    """Bounding boxes (start, end, kernel index) and correlation of every segment, with the elapsed time."""
+    awds, spectra = AWDS(), Spectra(dtype)
+    boxes, correlations, elapsed = [], [], 0.0
+    for segment in segments:
+        start = time.perf_counter()
+        freqs, t, spectrogram = spectra.spectrogram(segment.signal, segment.fs)
+        t = t * 2
+        t_res, f_res = spectra.get_time_res(t), spectra.get_freq_res(freqs)
+        try:
+            bboxes, _ = awds.detect(spectra, spectrogram, freqs, t_res, f_res, segment.L, dtype=dtype)
+        except IndexError:
+            # no detection in the segment, an error row for AWDS.main
+            bboxes = []
+        elapsed += time.perf_counter() - start
+        boxes.append({(b[0], b[1], int(b[4])) for b in bboxes})
+
+        # correlation of the default kernel, the detection statistic
+        model = WhistlerModel(t_res, f_res, 4.5e3, 11.5e3, 25e3, dtype)
+        sliced, _ = spectra.apply_slice(4.5, 11.5, freqs, spectrogram)
+        correlations.append(spectra.get_correlation(spectra.apply_zscore(sliced), model.whistler_sim(50)))
+    return boxes, correlations, elapsed
+
+
+def main(n_rows=600, whistlers=40):
+    with tempfile.TemporaryDirectory() as folder:
+        full_path = write_efd_file(folder, n_rows, whistlers=whistlers)
+        file_name = os.path.basename(full_path)
+        segments = list(EFD().iter_vlf_segments(folder, file_name))
+        print(f"{len(segments)} burst segments, {whistlers} injected whistlers")
+
+        boxes64, corr64, t64 = detections(segments, None)
+        boxes32, corr32, t32 = detections(segments, np.float32)
+
+    both = sum(len(a & b) for a, b in zip(boxes64, boxes32))
+    only64 = sum(len(a - b) for a, b in zip(boxes64, boxes32))
+    only32 = sum(len(b - a) for a, b in zip(boxes64, boxes32))
+    error = max(np.abs(a - b).max() / np.abs(a).max() for a, b in zip(corr64, corr32))
+    print(f"float64 : {t64:7.3f} s, {both + only64} detections, correlation {corr64[0].dtype}")
+    print(f"float32 : {t32:7.3f} s, {both + only32} detections, correlation {corr32[0].dtype}")
+    print(f"agreement {both / max(1, both + only64 + only32):.1%} ({both} common, {only64} float64 only, "
+          f"{only32} float32 only), max relative correlation error {error:.1e}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
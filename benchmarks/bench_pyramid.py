@@ -0,0 +1,54 @@
+"""Spectrogram pyramid (Spectra.write_pyramid / pyramid_tile) on a synthetic orbit: build time and size of the product,
+then the read time of an orbit overview and of a zoom on one segment against recomputing their spectrograms.
+
+    python -m benchmarks.bench_pyramid [n_rows] [width]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from awds.efd import EFD
+from awds.spectra import Spectra
+from benchmarks.synthetic import write_efd_file
+
+
+def timed(func, repeat=5):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(n_rows=600, width=800):
+    spectra = Spectra()
+    with tempfile.TemporaryDirectory() as folder:
+        full_path = write_efd_file(folder, n_rows, whistlers=20)
+        segments = list(EFD().iter_vlf_segments(folder, os.path.basename(full_path)))
+        path = os.path.join(folder, "orbit.pyramid.h5")
+
+        start = time.perf_counter()
+        spectra.write_pyramid(segments, path, source_path=full_path)
+        build = time.perf_counter() - start
+        print(f"{len(segments)} burst segments: pyramid built in {build:.2f} s, "
+              f"{os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+        _, recompute = timed(lambda: [spectra.spectrogram(s.signal, s.fs) for s in segments], repeat=1)
+        (_, times, tile, level), overview = timed(lambda: spectra.pyramid_tile(path, width=width))
+        print(f"overview: {tile.shape[1]} columns at level {level} in {overview * 1e3:.1f} ms, "
+              f"recomputing the orbit {recompute:.2f} s")
+
+        segment = segments[len(segments) // 2]
+        zoom_start = np.datetime64(segment.t0, 'ns')
+        zoom_stop = zoom_start + np.timedelta64(2, 's')
+        (_, _, tile, level), zoom = timed(lambda: spectra.pyramid_tile(path, zoom_start, zoom_stop, width=width))
+        _, single = timed(lambda: spectra.spectrogram(segment.signal, segment.fs))
+        print(f"zoom 2 s: {tile.shape[1]} columns at level {level} in {zoom * 1e3:.1f} ms, "
+              f"recomputing the segment {single * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,38 @@
+"""Batched frame-reshape STFT (Spectra.spectrogram_batch) against one scipy.signal.spectrogram call per segment,
+on the burst segments of an orbit.
+
+    python -m benchmarks.bench_spectrogram [n_segments] [segment_seconds]
+"""
+import sys
+import time
+
+import numpy as np
+
+from awds.spectra import Spectra
+from benchmarks.synthetic import SAMPLING_FREQUENCY
+
+
+def main(n_segments=30, segment_seconds=10):
+    rng = np.random.default_rng(0)
+    signals = [rng.standard_normal(segment_seconds * SAMPLING_FREQUENCY, dtype=np.float32)
+               for _ in range(n_segments)]
+    spectra = Spectra()
+    print(f"{n_segments} segments of {segment_seconds} s at {SAMPLING_FREQUENCY} Hz")
+
+    start = time.perf_counter()
+    single = [spectra.spectrogram(s, SAMPLING_FREQUENCY) for s in signals]
+    t_single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    freqs, batch = spectra.spectrogram_batch(signals, SAMPLING_FREQUENCY)
+    t_batch = time.perf_counter() - start
+
+    assert all(np.array_equal(f, freqs) and np.array_equal(t, bt) and np.array_equal(S, bS)
+               for (f, t, S), (bt, bS) in zip(single, batch))
+    print(f"per segment : {t_single:7.3f} s")
+    print(f"batch       : {t_batch:7.3f} s")
+    print(f"speedup {t_single / t_batch:6.1f}x, identical output")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
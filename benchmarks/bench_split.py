@@ -0,0 +1,41 @@
+"""searchsorted segmentation against the original mask-per-window split_file on multi-hour frames.
+
+    python -m benchmarks.bench_split [hours ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from awds.reader import split_frame
+from benchmarks import legacy
+
+
+def frame(hours, row_ms=40):
+    """Burst-like frame with one row every row_ms and a few gaps."""
+    steps = np.full(int(hours * 3600e3 / row_ms), row_ms, dtype=np.int64)
+    steps[::5000] = 60000
+    times = np.datetime64('2019-02-27T15:15:34.123') + np.cumsum(steps).astype('timedelta64[ms]')
+    return pd.DataFrame({'DateTime': times.astype('datetime64[ns]'), 'L': np.linspace(1, 3, times.size)})
+
+
+def main(*hours):
+    for h in hours or (0.5, 1, 2):
+        df = frame(h)
+        for overlap in (0, 2):
+            start = time.perf_counter()
+            old = legacy.split_file(df, 10, overlap)
+            old_time = time.perf_counter() - start
+            start = time.perf_counter()
+            new = split_frame(df, 10, overlap)
+            new_time = time.perf_counter() - start
+
+            assert len(old) == len(new)
+            assert all(a.index.equals(b.index) for a, b in zip(old, new))
+            print(f"{h:4.1f} h {len(df):8d} rows overlap {overlap}: {len(new):5d} segments  "
+                  f"legacy {old_time:7.3f} s  searchsorted {new_time:7.3f} s  {old_time / new_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main(*[float(a) for a in sys.argv[1:]])
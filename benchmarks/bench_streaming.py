@@ -0,0 +1,64 @@
+"""Streaming spectrogram (StreamingSpectrogram) against the batch slice + apply_zscore path on the burst segments of a
+synthetic orbit with injected whistlers: normalized values, CFAR detections and time per frame.
+
+    python -m benchmarks.bench_streaming [n_rows] [whistlers] [chunk_samples]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from awds.adaptive_threshold import AdaptiveThreshold
+from awds.detector import Detector
+from awds.efd import EFD
+from awds.spectra import Spectra, StreamingSpectrogram
+from awds.whistler import WhistlerModel
+from benchmarks.synthetic import write_efd_file
+
+LOWER, UPPER = 4.5, 11.5
+
+
+def starts(spectra, normalized, kernel, t_res):
+    """Detection start times, rounded to 0.1 s, of the correlation + fusion CFAR chain of AWDS.detect"""
+    corr = spectra.get_correlation(normalized, kernel)
+    pulses = AdaptiveThreshold().detection_pulse(corr, 'fusion_cfar')
+    locations = Detector.detection_starting_locations(corr, pulses, t_res)
+    return set(Detector.detection_starting_locations_final(locations)[:, 0]) if len(locations) else set()
+
+
+def main(n_rows=600, whistlers=40, chunk_samples=4096):
+    spectra = Spectra()
+    with tempfile.TemporaryDirectory() as folder:
+        full_path = write_efd_file(folder, n_rows, whistlers=whistlers)
+        segments = list(EFD().iter_vlf_segments(folder, os.path.basename(full_path)))
+    print(f"{len(segments)} burst segments, {whistlers} injected whistlers, chunks of {chunk_samples} samples")
+
+    for mode, frames in (('window', 2000), ('window', 500), ('ewm', 2000), ('ewm', 500)):
+        difference, common, batch_only, stream_only, elapsed, emitted = [], 0, 0, 0, 0.0, 0
+        for segment in segments:
+            freqs, t, spectrogram = spectra.spectrogram(segment.signal, segment.fs)
+            t_res, f_res = spectra.get_time_res(t * 2), spectra.get_freq_res(freqs)
+            batch = spectra.apply_zscore(spectra.apply_slice(LOWER, UPPER, freqs, spectrogram)[0])
+
+            stream = StreamingSpectrogram(segment.fs, LOWER, UPPER, frames=frames, mode=mode)
+            start = time.perf_counter()
+            pieces = [stream.push(segment.signal[i:i + chunk_samples])[1]
+                      for i in range(0, segment.signal.shape[-1], chunk_samples)]
+            elapsed += time.perf_counter() - start
+            streamed = np.concatenate(pieces, axis=-1)
+            emitted += streamed.shape[-1]
+            difference.append(np.abs(streamed - batch).mean())
+
+            kernel = WhistlerModel(t_res, f_res, LOWER * 1e3, UPPER * 1e3, 25e3).whistler_sim(50)
+            a, b = starts(spectra, batch, kernel, t_res), starts(spectra, streamed, kernel, t_res)
+            common, batch_only, stream_only = common + len(a & b), batch_only + len(a - b), stream_only + len(b - a)
+
+        print(f"{mode:6s} {frames:4d} frames: mean |z difference| {np.mean(difference):.3f}, detections "
+              f"{common / max(1, common + batch_only + stream_only):.1%} equal ({batch_only} batch only, "
+              f"{stream_only} stream only), {elapsed / emitted * 1e6:.1f} us per frame")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,138 @@
+"""Reference copies of the pre-optimisation code paths, kept only to benchmark and cross-check against."""
+import math
+import struct
+from datetime import datetime, timedelta
+from itertools import chain
+
+import h5py
+import numpy as np
+import pandas as pd
+
+
+def efd_read_frame(full_path, file_name):
+    """Row-by-row EFD decode as done by the original EFD.read, returning the full frame."""
+    with h5py.File(full_path, "r") as f:
+        Workmode = f['WORKMODE'][()][:, 0]
+        UTC_TIME = f['UTC_TIME'][()][:, 0]
+        MAG_LAT = f['MAG_LAT'][()][:, 0]
+        MAG_LON = f['MAG_LON'][()][:, 0]
+        GEO_LAT = f['GEO_LAT'][()][:, 0]
+        GEO_LON = f['GEO_LON'][()][:, 0]
+        ALT = f['ALTITUDE'][()][:, 0]
+
+        A131_W = f['A131_W'][()]
+        A132_W = f['A132_W'][()]
+        A133_W = f['A133_W'][()]
+        A131_P = f['A131_P'][()]
+        A132_P = f['A132_P'][()]
+        A133_P = f['A133_P'][()]
+
+        d = ['DateTime', "OrbitNumber", 'Frequency', 'GEO_LAT', 'GEO_LON', 'ALTITUDE', 'WORKMODE', 'Signal', 'X',
+             'Z', 'L', 'MAG_LAT', 'MAG_LON']
+        OrbitNumber = file_name.split("_")[6]
+        sampling_frequency = 51200
+        listp = []
+        signal_A131_W = np.array_split(np.asarray(list(chain.from_iterable(A131_W))),
+                                       int(A131_W.shape[0] * A131_W.shape[1] / sampling_frequency))
+        signal_A132_W = np.array_split(np.asarray(list(chain.from_iterable(A132_W))),
+                                       int(A132_W.shape[0] * A132_W.shape[1] / sampling_frequency))
+        signal_A133_W = np.array_split(np.asarray(list(chain.from_iterable(A133_W))),
+                                       int(A133_W.shape[0] * A133_W.shape[1] / sampling_frequency))
+        index = -1
+        index_s = -1
+        count_workmode = sum(1 for mode in Workmode if mode != 2)
+        final_range = count_workmode + len(signal_A131_W) - 1
+        for i in range(final_range):
+            if Workmode[i] == 2:
+                index += 1
+            else:
+                index_s += 1
+
+            listp.append((UTC_TIME[i], OrbitNumber, 50000, GEO_LAT[i], GEO_LON[i], ALT[i], Workmode[i],
+                          signal_A131_W[index] if Workmode[i] == 2 else A131_P[index_s],
+                          signal_A132_W[index] if Workmode[i] == 2 else A132_P[index_s],
+                          signal_A133_W[index] if Workmode[i] == 2 else A133_P[index_s],
+                          1 / math.pow(math.cos(math.radians(MAG_LAT[i])), 2), MAG_LAT[i], MAG_LON[i]))
+
+        df = pd.DataFrame(listp, columns=d)
+        df['DateTime'] = pd.to_datetime(df['DateTime'], format='%Y%m%d%H%M%S%f', errors='coerce')
+        return df
+
+
+def split_file(df, seconds, overlap=0):
+    """Boolean-mask segmentation as done by the original EFD/Demeter split_file."""
+    start_time = df.DateTime.loc[0] - timedelta(seconds=overlap)
+    split = []
+    while True:
+        end_time = start_time + timedelta(seconds=seconds + overlap)
+        mask = (df.DateTime > start_time) & (df.DateTime <= end_time)
+        value = df.loc[mask]
+        if value.size > 0:
+            split.append(value)
+
+        if start_time > df.DateTime.values[-1]:
+            break
+        else:
+            start_time = end_time - timedelta(seconds=overlap)
+
+    return split
+
+
+def demeter_1131_frame(full_path):
+    """Record-by-record struct decode as done by the original Demeter1131 reader."""
+    columns = ["DateTime", "OrbitNumber", "SubOrbitType", "GeocLat", "GeocLong", "Altitude", "GeomagLat",
+               "GeomagLong", "MLT", "InvLat", "L", "ConjsatGeocLat", "ConjsatGeocLong", "Nconj110GeocLat",
+               "Nconj110GeocLong", "Sconj110GeocLat", "Sconj110GeocLong", "b_field_x", "b_field_y", "b_field_z",
+               "GyroFreq", "DataType", "CoordSystem", "DataUnit", "Frequency", "SampleNumber", "TotalDuration",
+               "Nam1c", "Signal"]
+    with open(full_path, "rb") as binary_file:
+        data = binary_file.read()
+    listp = []
+    for i in range(0, len(data), 33063):
+        line = data[i:i + 33063]
+        date = struct.unpack(">7h", line[8:22])
+        orbit_n = struct.unpack(">2h", line[22:26])
+        orbit_param = struct.unpack(">3f", line[38:50])
+        geomag_param = struct.unpack(">15f", line[54:114])
+        data_type = struct.unpack("@21s", line[204:225])
+        header_info = struct.unpack(">9s16sfhf3s", line[257:295])
+        array = np.frombuffer(line[295:33063], dtype=np.dtype(np.float32).newbyteorder('>'))
+        dt_string = f"{date[0]} {date[1]} {date[2]} {date[3]} {date[4]} {date[5]} {date[6]}"
+        dt_object = datetime.strptime(dt_string, "%Y %m %d %H %M %S %f")
+        listp.append((dt_object,) + orbit_n + orbit_param + geomag_param + data_type + header_info + (array,))
+
+    return pd.DataFrame(listp, columns=columns)
+
+
+def demeter_1138_analysis(df):
+    """Record-by-record Demeter1138.make_df_for_analysis as originally written."""
+    columns = ["L", "OrbitNumber", "SubOrbitType", "GeocLat", "GeocLong", "Altitude", "GeomagLat", "GeomagLong"]
+    classed_c = ['DateTime'] + columns + [
+        '(0.0-2.5)', '(2.5-3.2)', '(3.2-4.0)', '(4.0-5.0)', '(5.0-6.3)', '(6.3-7.9)', '(7.9-10.0)', '(10.0-12.6)',
+        '(12.6-15.9)', '(15.9-20.0)', '(20.0-25.2)', '(25.2-31.7)', '(31.7-40.0)', '(40.0-50.4)', '(50.4-63.5)',
+        '(63.5-80.0)', '(80.0-101.0)', '(101.0-127.0)', '(127.0-202.0)', '(0.0-0.0)']
+    listp = []
+    for i in range(df.shape[0]):
+        df_loc = df.loc[i]
+        v = df_loc['SP_INTENS_TABLE'].reshape(128, 20)
+        for index in range(v.shape[0]):
+            res = df_loc['T_RES'] * index * 1000
+            if np.count_nonzero(v[index]) > 0:
+                time = df_loc.DateTime + np.timedelta64(int(res), 'ms')
+                listp.append((time,) + tuple(df_loc[columns].values) + tuple(v[index]))
+
+    return pd.DataFrame(listp, columns=classed_c)
+
+
+def whistler_model_kernels(t_res, f_res, low_f, high_f, fn, An=0.35, magnitude=1):
+    """Kernels simulated eagerly by the original WhistlerModel constructor, D0 1-100 then 100-200, by str(D0)."""
+    f = np.linspace(low_f, high_f, 1000)
+    kernels = {}
+    for d in np.concatenate((np.arange(1, 101, 1), np.arange(100, 201, 1))):
+        t = (d / ((1 + An) * np.sqrt(f))) * (((1 + An) - (3 * An - 1) * (f / fn)) / (1 - An * f / fn))
+        t_trans, f_trans = ((t - t.min()) / t_res).astype(int), ((f - f.min()) * 1e-3 / f_res).astype(int)
+        data = np.zeros((t_trans.max() + 1, f_trans.max() + 1))
+        for x, y in zip(t_trans, f_trans):
+            data[x, y] = magnitude
+        kernels[str(d)] = data.T
+    return kernels
@@ -0,0 +1,162 @@
+"""Synthetic CSES EFD files shaped like the L02 VLF product, and DEMETER ICE files, used by the benchmarks."""
+import os
+import struct
+from datetime import datetime, timedelta
+
+import h5py
+import numpy as np
+
+FILE_NAME = "CSES_01_EFD_3_L02_A1_059341_20190227_151534_20190227_155009_000.h5"
+SAMPLING_FREQUENCY = 51200
+ROW_SAMPLES = 2048
+SPECTRUM_BINS = 1024
+DEMETER_1131_FILE_NAME = "DMT_N1_1131_012345_20050101_000000_20050101_003000.DAT"
+DEMETER_1131_ROW_SIZE = 33063
+DEMETER_SAMPLES = 8192
+DEMETER_SAMPLING_FREQUENCY = 40000
+DEMETER_1132_FILE_NAME = "DMT_N1_1132_012345_20050101_000000_20050101_003000.DAT"
+DEMETER_1138_FILE_NAME = "DMT_N1_1138_012345_20050101_000000_20050101_003000.DAT"
+DEMETER_1138_ROW_SIZE = 5706
+
+
+def utc_time(n_rows, start=datetime(2019, 2, 27, 15, 15, 34, 123000), step_ms=2048):
+    """UTC_TIME column encoded as YYYYMMDDHHMMSSmmm integers."""
+    times = [start + timedelta(milliseconds=i * step_ms) for i in range(n_rows)]
+    return np.array([int(t.strftime("%Y%m%d%H%M%S") + "%03d" % (t.microsecond // 1000)) for t in times],
+                    dtype=np.int64)
+
+
+def workmode(n_rows, burst_fraction):
+    """Survey rows (1) around one central burst window (2)."""
+    mode = np.ones(n_rows, dtype=np.int32)
+    n_burst = int(n_rows * burst_fraction)
+    start = (n_rows - n_burst) // 2
+    mode[start:start + n_burst] = 2
+    return mode
+
+
+def whistler(d0, low_f=4000, high_f=11500, fs=SAMPLING_FREQUENCY):
+    """Unit amplitude whistler, a falling tone with t = d0 / sqrt(f) from high_f down to low_f."""
+    t = np.arange(d0 / np.sqrt(high_f), d0 / np.sqrt(low_f), 1 / fs)
+    return np.sin(2 * np.pi * d0 ** 2 * (1 / t[0] - 1 / t)).astype(np.float32)
+
+
+def write_efd_file(folder, n_rows=1050, burst_fraction=0.3, file_name=FILE_NAME, seed=0, whistlers=0):
+    """Write an orbit-sized synthetic EFD file and return its full path.
+    Params
+        folder: destination folder
+        n_rows: number of UTC rows (one every 2.048 s, ~36 min for the default)
+        burst_fraction: fraction of rows recorded in burst mode (WORKMODE == 2)
+        whistlers: number of whistlers added to the burst waveforms, evenly spaced
+    Return
+        full path of the written file"""
+    rng = np.random.default_rng(seed)
+    mode = workmode(n_rows, burst_fraction)
+    n_burst = int(np.count_nonzero(mode == 2))
+    w_rows = n_burst * SAMPLING_FREQUENCY // ROW_SAMPLES
+    lat = np.linspace(-60, 60, n_rows, dtype=np.float32)
+
+    full_path = os.path.join(folder, file_name)
+    with h5py.File(full_path, "w") as f:
+        f['WORKMODE'] = mode[:, None]
+        f['UTC_TIME'] = utc_time(n_rows)[:, None]
+        f['MAG_LAT'] = lat[:, None] - 5
+        f['MAG_LON'] = np.linspace(0, 90, n_rows, dtype=np.float32)[:, None]
+        f['GEO_LAT'] = lat[:, None]
+        f['GEO_LON'] = np.linspace(10, 100, n_rows, dtype=np.float32)[:, None]
+        f['ALTITUDE'] = np.full((n_rows, 1), 507.0, dtype=np.float32)
+        f['FREQ'] = np.linspace(0, 25600, SPECTRUM_BINS, dtype=np.float32)[:, None]
+        for channel in ['A131', 'A132', 'A133']:
+            waveform = rng.standard_normal((w_rows, ROW_SAMPLES), dtype=np.float32)
+            flat = waveform.reshape(-1)
+            for start in np.linspace(0, flat.size, whistlers, endpoint=False).astype(int):
+                trace = whistler(rng.uniform(20, 80))[:flat.size - start]
+                flat[start:start + trace.size] += rng.uniform(2, 6) * trace
+            f[channel + '_W'] = waveform
+            f[channel + '_P'] = rng.random((n_rows, SPECTRUM_BINS), dtype=np.float32)
+
+    return full_path
+
+
+def demeter_header(time, orbit, lat):
+    """Date, orbit and geomagnetic block shared by the DEMETER level 1 products (bytes 0-204)."""
+    header = bytearray(204)
+    struct.pack_into(">7h", header, 8, time.year, time.month, time.day, time.hour, time.minute, time.second,
+                     time.microsecond // 1000)
+    struct.pack_into(">2h", header, 22, orbit, 1)
+    struct.pack_into(">3f", header, 38, lat, lat * 2, 710.0)
+    struct.pack_into(">15f", header, 54, lat - 5, lat * 2, 12.0, 30.0, 1 / np.cos(np.radians(lat - 5)) ** 2,
+                     *np.linspace(1, 9, 9), 120.0)
+    return header
+
+
+def write_demeter_1131_file(folder, n_records=2000, file_name=DEMETER_1131_FILE_NAME, seed=0):
+    """Write a DEMETER ICE 1131 (VLF electric field waveform) file of consecutive records.
+    Params
+        folder: destination folder
+        n_records: number of 33063 byte records, one every 0.2048 s
+    Return
+        full path of the written file"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2005, 1, 1, 0, 0, 0, 7000)
+    lat = np.linspace(-60, 60, n_records)
+    full_path = os.path.join(folder, file_name)
+    with open(full_path, "wb") as fh:
+        for i in range(n_records):
+            time = start + timedelta(microseconds=i * 204800)
+            record = demeter_header(time, 12345, lat[i]) + bytearray(DEMETER_1131_ROW_SIZE - 204)
+            struct.pack_into("@21s", record, 204, b"VLF E-field waveform")
+            struct.pack_into(">9s16sfhf3s", record, 257, b"GEI", b"mV/m", DEMETER_SAMPLING_FREQUENCY,
+                             DEMETER_SAMPLES, DEMETER_SAMPLES / DEMETER_SAMPLING_FREQUENCY, b"E12")
+            record[295:] = rng.standard_normal(DEMETER_SAMPLES).astype('>f4').tobytes()
+            fh.write(record)
+
+    return full_path
+
+
+def write_demeter_1132_file(folder, n_records=900, nb=4, nbf=1024, total_duration=2.048, freq_res=19.53125,
+                            file_name=DEMETER_1132_FILE_NAME, seed=0):
+    """Write a DEMETER ICE 1132 (VLF electric field spectrum) file, NB spectra of NBF bins per record.
+    Return
+        full path of the written file"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2005, 1, 1, 0, 0, 0, 7000)
+    lat = np.linspace(-60, 60, n_records)
+    full_path = os.path.join(folder, file_name)
+    with open(full_path, "wb") as fh:
+        for i in range(n_records):
+            time = start + timedelta(seconds=i * total_duration)
+            record = demeter_header(time, 12345, lat[i]) + bytearray(114 + nb * nbf * 4)
+            struct.pack_into("@21s", record, 204, b"VLF E-field spectrum")
+            struct.pack_into(">Bh2f", record, 285, nb, nbf, total_duration, freq_res)
+            record[318:] = rng.random(nb * nbf).astype('>f4').tobytes()
+            fh.write(record)
+
+    return full_path
+
+
+def write_demeter_1138_file(folder, n_records=500, t_res=0.004, fill=0.3, file_name=DEMETER_1138_FILE_NAME, seed=0):
+    """Write a DEMETER ICE 1138 (classified spectral intensity) file, 128 x 20 intensity classes per record.
+    Params
+        fill: fraction of intensity rows holding at least one non-zero class
+    Return
+        full path of the written file"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2005, 1, 1, 0, 0, 0, 7000)
+    lat = np.linspace(-60, 60, n_records)
+    full_path = os.path.join(folder, file_name)
+    with open(full_path, "wb") as fh:
+        for i in range(n_records):
+            time = start + timedelta(seconds=i * 128 * t_res)
+            record = demeter_header(time, 12345, lat[i]) + bytearray(DEMETER_1138_ROW_SIZE - 204)
+            struct.pack_into("@21s", record, 204, b"VLF E-field classes")
+            struct.pack_into(">B20s3sf3B", record, 257, 1, b"whistler classes", b"E12", t_res, 20, 1, 128)
+            struct.pack_into("@10s", record, 288, b"dB")
+            record[298:458] = np.linspace(0, 202, 40).astype('>f4').tobytes()
+            intensity = rng.integers(1, 255, (128, 20), dtype=np.uint8)
+            intensity[rng.random(128) >= fill] = 0
+            record[458:586] = np.ones(128, dtype=np.uint8).tobytes()
+            record[586:3146] = intensity.tobytes()
+            fh.write(record)
+
+    return full_path
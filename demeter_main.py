@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import multiprocessing
+import os
+
+from awds.demeter import Demeter1131
+from awds.persistence import StoreDemeter
+from awds.awds_with_persistence import AWDS
+from joblib import Parallel, delayed
+from tqdm import tqdm
+
+# DEMETER ICE 1131 archives, laid out as fileH5: <year>/<month>/<file>.DAT
+DAT_FOLDER = os.path.join(os.getcwd(), "fileDAT")
+PKL_FOLDER = os.path.join(os.getcwd(), "filePKL")
+
+
+def find_whistlers(file_tuple):
+    year, month, file_name = file_tuple
+    folder_path = os.path.join(DAT_FOLDER, year, month)
+
+    data_analysis_path = PKL_FOLDER
+    if not os.path.exists(data_analysis_path):
+        os.makedirs(data_analysis_path)
+
+    target_pkl = os.path.splitext(file_name)[0] + ".pkl"
+    if target_pkl in os.listdir(data_analysis_path):
+        return
+
+    # built in the worker, the pool does not share the module state of the parent
+    AWDS().main(Demeter1131(), StoreDemeter(), folder_path, file_name)
+
+
+def list_dat_files(folder):
+    list_files = []
+    years_list = [d for d in os.listdir(folder) if os.path.isdir(os.path.join(folder, d))]
+    for y in years_list:
+        months = [m for m in os.listdir(os.path.join(folder, y)) if os.path.isdir(os.path.join(folder, y, m))]
+        for m in months:
+            dir_path = os.path.join(folder, y, m)
+            for fn in os.listdir(dir_path):
+                if fn.upper().endswith('.DAT') and '_1131_' in fn:
+                    list_files.append((y, m, fn))
+    return list_files
+
+
+if __name__ == "__main__":
+    list_files = list_dat_files(DAT_FOLDER)
+
+    num_cores = multiprocessing.cpu_count()
+    inputs = tqdm(list_files, position=0, leave=True)
+    Parallel(n_jobs=num_cores)(delayed(find_whistlers)(i) for i in inputs)
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import argparse
 import multiprocessing
 import os
 
@@ -11,10 +12,12 @@ from tqdm import tqdm
 # Use the same base folders as visualizer.py
 H5_FOLDER = os.path.join(os.getcwd(), "fileH5")
 PKL_FOLDER = os.path.join(os.getcwd(), "filePKL")
+# sidecars of --sidecar, kept out of the data folders
+SIDECAR_FOLDER = os.path.join(PKL_FOLDER, "sidecars")
 
-def find_whistlers(file_tuple):
+def find_whistlers(file_tuple, sidecar_folder=None):
     year, month, file_name = file_tuple
-    folder_path = H5_FOLDER
+    folder_path = os.path.join(H5_FOLDER, year, month)
 
     data_analysis_path = PKL_FOLDER
     if not os.path.exists(data_analysis_path):
@@ -24,10 +27,18 @@ def find_whistlers(file_tuple):
     if target_pkl in os.listdir(data_analysis_path):
         return
 
-    awds.main(reader, store, folder_path, file_name)
+    # built in the worker, the pool does not share the module state of the parent
+    reader = EFD(sidecar=sidecar_folder is not None, sidecar_folder=sidecar_folder)
+    AWDS().main(reader, StoreEFD(), folder_path, file_name)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Whistler detection on the CSES EFD files of fileH5/<year>/<month>/")
+    parser.add_argument("--sidecar", nargs="?", const=SIDECAR_FOLDER, default=None, metavar="FOLDER",
+                        help="keep a decoded sidecar of each file in FOLDER (default filePKL/sidecars), "
+                             "worth it only when the files are read again")
+    args = parser.parse_args()
+
     # Enumerate files under H5_FOLDER
     years_list = [d for d in os.listdir(H5_FOLDER) if os.path.isdir(os.path.join(H5_FOLDER, d))]
     list_files = []
@@ -39,10 +50,6 @@ if __name__ == "__main__":
                 if fn.endswith('.h5'):
                     list_files.append((y, m, fn))
 
-    awds = AWDS()
-    store = StoreEFD()
-    reader = EFD()
-
     num_cores = multiprocessing.cpu_count()
     inputs = tqdm(list_files, position=0, leave=True)
-    Parallel(n_jobs=num_cores)(delayed(find_whistlers)(i) for i in inputs)
\ No newline at end of file
+    Parallel(n_jobs=num_cores)(delayed(find_whistlers)(i, args.sidecar) for i in inputs)
\ No newline at end of file
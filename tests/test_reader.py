@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from awds.reader import segment_bounds, split_frame, utc_time_to_datetime64
+from benchmarks import legacy
+from benchmarks.bench_utc_time import encode
+
+
+def strptime(utc_time):
+    """UTC_TIME decoded as the original readers did, through the string and its format"""
+    return pd.to_datetime(pd.Series(utc_time).astype(str), format='%Y%m%d%H%M%S%f', errors='coerce').values
+
+
+def test_utc_time_matches_strptime():
+    rng = np.random.default_rng(0)
+    start = np.datetime64('2018-03-01T00:00:00.000')
+    times = start + np.sort(rng.integers(0, 6 * 365 * 86400000, 1000)).astype('timedelta64[ms]')
+    utc_time = encode(times)
+    decoded = utc_time_to_datetime64(utc_time)
+    assert decoded.dtype == np.dtype('datetime64[ms]')
+    assert (decoded == times).all()
+    assert (decoded == strptime(utc_time)).all()
+
+
+def test_utc_time_leap_day():
+    assert utc_time_to_datetime64(np.array([20200229235959999]))[0] == strptime([20200229235959999])[0]
+
+
+@pytest.mark.parametrize("utc_time, strptime_nat", [
+    (20190229120000000, True),  # no 29 February in 2019
+    (20190100120000000, True),  # day 0
+    (20190431120000000, True),  # 31 April
+    # strptime reads these with shorter fields (month 13 as 1, then day 30...) instead of rejecting them
+    (20191301120000000, False),  # month 13
+    (20190227240000000, False),  # hour 24
+    (20190227126000000, False),  # minute 60
+    (20190227120060000, False),  # second 60
+])
+def test_utc_time_invalid_fields_are_nat(utc_time, strptime_nat):
+    assert np.isnat(utc_time_to_datetime64(np.array([utc_time]))[0])
+    assert pd.isna(strptime([utc_time])[0]) == strptime_nat
+
+
+def test_utc_time_keeps_shape():
+    utc_time = np.array([[20190227151534123, 20191301000000000]] * 3)
+    decoded = utc_time_to_datetime64(utc_time)
+    assert decoded.shape == (3, 2)
+    assert np.isnat(decoded[:, 1]).all() and not np.isnat(decoded[:, 0]).any()
+
+
+def burst_frame(rows=2000, row_ms=40):
+    """Frame with a row every row_ms, a few gaps and a last segment shorter than the others"""
+    steps = np.full(rows, row_ms, dtype=np.int64)
+    steps[::700] = 60000
+    steps[-1] = 3700
+    times = np.datetime64('2019-02-27T15:15:34.123') + np.cumsum(steps).astype('timedelta64[ms]')
+    return pd.DataFrame({'DateTime': times.astype('datetime64[ns]'), 'L': np.linspace(1, 3, rows)})
+
+
+@pytest.mark.parametrize("seconds, overlap", [(10, 0), (10, 2), (7, 0), (3, 1)])
+def test_split_frame_matches_legacy_split(seconds, overlap):
+    df = burst_frame()
+    expected = legacy.split_file(df, seconds, overlap)
+    segments = split_frame(df, seconds, overlap)
+    assert len(segments) == len(expected)
+    assert all(a.index.equals(b.index) for a, b in zip(segments, expected))
+
+    starts, stops = segment_bounds(df.DateTime.values, seconds, overlap)
+    assert [(start, stop) for start, stop in zip(starts, stops)] == \
+           [(segment.index[0], segment.index[-1] + 1) for segment in expected]
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from awds.efd import EFD
+from awds.sidecar import Sidecar
+from benchmarks.synthetic import write_efd_file
+
+
+def segments(reader, folder, file_name):
+    return [(segment.t0, segment.signal.copy()) for segment in reader.iter_vlf_segments(folder, file_name)]
+
+
+def assert_same_segments(a, b):
+    assert len(a) == len(b)
+    assert all(t0 == other_t0 and np.array_equal(signal_, other) for (t0, signal_), (other_t0, other) in zip(a, b))
+
+
+def test_sidecar_rebuilt_after_source_change(tmp_path):
+    data, sidecars = str(tmp_path / "data"), str(tmp_path / "sidecars")
+    os.makedirs(data)
+    file_name = os.path.basename(write_efd_file(data, 200))
+    reader = EFD(sidecar=True, sidecar_folder=sidecars)
+    sidecar = Sidecar(os.path.join(data, file_name), sidecars)
+
+    assert_same_segments(segments(reader, data, file_name), segments(EFD(), data, file_name))
+    assert sidecar.is_valid()
+    assert os.listdir(data) == [file_name]
+
+    # new size: another orbit written under the same name
+    write_efd_file(data, 300, seed=1)
+    assert not sidecar.is_valid()
+    assert_same_segments(segments(reader, data, file_name), segments(EFD(), data, file_name))
+    assert sidecar.is_valid()
+
+    # same size, new modification time
+    stat = os.stat(os.path.join(data, file_name))
+    os.utime(os.path.join(data, file_name), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not sidecar.is_valid()
+    segments(reader, data, file_name)
+    assert sidecar.is_valid()
+    with np.load(sidecar.index_path) as index:
+        assert int(index['source_mtime']) == stat.st_mtime_ns + 10 ** 9
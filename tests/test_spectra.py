@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from awds.spectra import Spectra
+from awds.whistler import WhistlerModel
+
+FS = 50000
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.mark.parametrize("dtype", [None, np.float32])
+def test_spectrogram_batch_equals_spectrogram(rng, dtype):
+    spectra = Spectra(dtype=dtype)
+    # segments of different lengths with an uneven tail, as cut from a file
+    signals = [rng.standard_normal(n, dtype=np.float32) for n in (FS * 2, FS * 2 + 300, FS + 17)]
+    freqs, batch = spectra.spectrogram_batch(signals, FS)
+    for signal_, (time, Sxx) in zip(signals, batch):
+        expected_freqs, expected_time, expected = spectra.spectrogram(signal_, FS)
+        assert np.array_equal(freqs, expected_freqs)
+        assert np.array_equal(time, expected_time)
+        assert np.array_equal(Sxx, expected)
+
+
+def test_spectrogram_batch_stacked_channels(rng):
+    spectra = Spectra()
+    signals = [rng.standard_normal((3, n), dtype=np.float32) for n in (FS, FS + 1000)]
+    _, batch = spectra.spectrogram_batch(signals, FS)
+    for signal_, (_, Sxx) in zip(signals, batch):
+        assert Sxx.shape[0] == 3
+        assert np.array_equal(Sxx, spectra.spectrogram(signal_, FS)[2])
+
+
+@pytest.mark.parametrize("lower, upper", [(4.5, 11.5), (3.5, 8), (0, 25)])
+def test_spectrogram_band_equals_slice(rng, lower, upper):
+    spectra = Spectra()
+    signal_ = rng.standard_normal((2, FS * 2 + 100))
+    freqs, time, Sxx = spectra.spectrogram(signal_, FS)
+    expected, expected_freqs = spectra.apply_slice(lower, upper, freqs, Sxx)
+    band_freqs, band_time, band = spectra.spectrogram_band(signal_, FS, lower, upper)
+    assert np.array_equal(band_freqs, expected_freqs)
+    assert np.array_equal(band_time, time)
+    assert band.shape == expected.shape
+    np.testing.assert_allclose(band, expected, rtol=0, atol=1e-9)
+
+
+def whistler_band(spectra, rng, channels=()):
+    """z-scored 4.5-11.5 kHz band of a noise segment, with the whistler model of its resolutions"""
+    freqs, time, Sxx = spectra.spectrogram(rng.standard_normal(channels + (FS * 2,)), FS)
+    band = spectra.apply_zscore(spectra.apply_slice(4.5, 11.5, freqs, Sxx)[0])
+    model = WhistlerModel(spectra.get_time_res(time * 2), spectra.get_freq_res(freqs), 4.5e3, 11.5e3, 25e3)
+    return band, model
+
+
+def direct_correlation(band, kernel):
+    """Row 0 of the 'valid' correlation of 10 ** band with the kernel, cropped to the band, channel by channel"""
+    kernel = kernel[:band.shape[-2]]
+    kernel = kernel.reshape((1,) * (band.ndim - 2) + kernel.shape)
+    return signal.correlate(10 ** band, kernel, mode='valid', method='direct')[..., 0, :]
+
+
+@pytest.mark.parametrize("channels", [(), (3,)])
+@pytest.mark.parametrize("d0", [10, 50, 200])
+def test_sparse_correlation_equals_direct(rng, channels, d0):
+    spectra = Spectra()
+    band, model = whistler_band(spectra, rng, channels)
+    kernel = model.whistler_sim(d0)
+    correlation = spectra.get_correlation(band, kernel)
+    assert correlation.shape == band.shape[:-2] + (band.shape[-1] - kernel.shape[1] + 1,)
+    np.testing.assert_allclose(correlation, direct_correlation(band, kernel), rtol=1e-10)
+    if channels:
+        # every channel as if it were correlated on its own
+        for channel in range(channels[0]):
+            np.testing.assert_allclose(correlation[channel], spectra.get_correlation(band[channel], kernel),
+                                       rtol=1e-12)
+
+
+def test_correlation_kernel_wider_than_segment(rng):
+    spectra = Spectra()
+    band, model = whistler_band(spectra, rng)
+    kernel = model.whistler_sim(200)
+    # shorter than the kernel along time: dense correlation instead of the sparse matched filter
+    short = band[:, :kernel.shape[1] - 5]
+    np.testing.assert_allclose(spectra.get_correlation(short, kernel), direct_correlation(short, kernel), rtol=1e-10)
@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+
+import awds.awds_with_persistence as awds_module
+from awds.awds_with_persistence import AWDS
+from awds.demeter import Demeter1132
+from awds.persistence import StoreDemeter, StoreDemeter1132
+from benchmarks.synthetic import write_demeter_1132_file
+
+
+def run_spectral(folder, store, monkeypatch):
+    full_path = write_demeter_1132_file(str(folder), n_records=60)
+    monkeypatch.setattr(awds_module, "PKL_FOLDER", str(folder / "pkl"))
+    AWDS().spectral(Demeter1132(), store, str(folder), os.path.basename(full_path))
+    return pd.read_pickle(os.path.join(awds_module.PKL_FOLDER, os.path.splitext(os.path.basename(full_path))[0] +
+                                       ".pkl"))
+
+
+def test_spectral_demeter_1132(tmp_path, monkeypatch):
+    frame = run_spectral(tmp_path, StoreDemeter1132(), monkeypatch)
+    started = frame[frame.D0 == -1]
+    # 60 records of 2.048 s in 10 s segments
+    assert len(started) == 12
+    assert list(frame.columns) == list(StoreDemeter1132().create_df().columns)
+    assert (started.OrbitNumber == 12345).all()
+    assert (started.FrequencyBins == 1024).all()
+    assert started.L.notna().all()
+
+
+def test_spectral_error_rows_without_store_columns(tmp_path, monkeypatch):
+    frame = run_spectral(tmp_path, StoreDemeter(), monkeypatch)
+    # the waveform store cannot read the 1132 metadata: every segment is an error row with empty metadata
+    assert len(frame) == 12
+    assert (frame.D0 == -2).all()
+    assert frame.DataUnit.isna().all()
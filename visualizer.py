@@ -2,11 +2,10 @@
 import os
 import sys
 import threading
+from itertools import islice
 import subprocess
 import pandas as pd
 import numpy as np
-import h5py
-from itertools import chain
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from PIL import Image, ImageTk
@@ -22,7 +21,7 @@ import matplotlib.pyplot as plt
 plt.ioff()
 
 # AWDS imports
-from awds.spectra import Spectra
+from awds.spectra import FFTBackend, Spectra, SpectrogramCache
 from awds.efd import EFD
 import awds.awds_with_persistence as awds_util
 from awds.awds_with_persistence import AWDS
@@ -43,9 +42,22 @@ DISPLAY_SCALE = 0.5
 PAGE_SIZE_SECONDS = 10
 PKL_FOLDER = os.path.join(os.getcwd(), "filePKL")
 FIG_FOLDER = os.path.join(os.getcwd(), "filePKL", "figures")
+SPEC_FOLDER = os.path.join(os.getcwd(), "filePKL", "spectrograms")
+# Sidecar dei file H5 (indice e segnale burst decodificato), fuori dalle cartelle dei dati
+SIDECAR_FOLDER = os.path.join(os.getcwd(), "filePKL", "sidecars")
+
+# Spettrogrammi condivisi da detection, pagine e detections: una FFT per segmento, anche tra sessioni.
+# Su disco al più 2 GiB (circa 1 MB per segmento), i meno usati di recente vengono rimossi
+SPEC_CACHE = SpectrogramCache(max_bytes=512 * 2 ** 20, folder=SPEC_FOLDER, max_disk_bytes=2 * 2 ** 30)
+# Un solo file alla volta: le FFT usano tutti i core
+SPEC_FFT = FFTBackend(workers=-1)
+# Blocchi per STFT batch delle pagine: in memoria c'è al più un gruppo di segmenti alla volta
+SPEC_BATCH_BLOCKS = 8
 
 # Larghezza minima per immagini Detections
 MIN_DET_WIDTH = 300
+# Altezza in pixel della panoramica dell'orbita
+OVERVIEW_HEIGHT = 300
 
 
 # Helper per centratura
@@ -62,13 +74,13 @@ def run_awds(filepath, debug=False):
         Crea il .pkl per il file H5 dato, replicando run_awds.py --path.
         """
         awds = AWDS()
-        reader = EFD()
+        reader = EFD(sidecar=True, sidecar_folder=SIDECAR_FOLDER)
         store  = StoreEFD()
 
         directory = os.path.dirname(filepath)
         filename  = os.path.basename(filepath)
 
-        awds.main(reader, store, directory, filename, debug_enabled=debug)
+        awds.main(reader, store, directory, filename, debug_enabled=debug, cache=SPEC_CACHE, fft=SPEC_FFT)
 
 
 class App:
@@ -115,7 +127,7 @@ class App:
         self._build_details_tab()
 
         # Contenitori dati
-        self.splits      = []
+        self.h5_source   = None   # (cartella, nome) del file H5 caricato
         self.page_index  = 0
         self.spec_pages  = []
         self.t0_global   = None
@@ -134,15 +146,13 @@ class App:
     def show_file_details(self, filepath):
         # Leggi metadati
         try:
-            with h5py.File(filepath, 'r') as f:
-                utc_raw  = f['UTC_TIME'][:].flatten()
-                utc_strs = [f"{int(x):017d}" for x in utc_raw]
-                times    = pd.to_datetime(utc_strs, format='%Y%m%d%H%M%S%f')
-                start_ts = times[0]
-                end_ts   = times[-1]
-                duration = (end_ts - start_ts).total_seconds()
-                lat = float(np.array(f['GEO_LAT'])[:].flatten()[0])
-                lon = float(np.array(f['GEO_LON'])[:].flatten()[0])
+            # solo dataset 1-D: nessun segnale viene letto
+            meta     = EFD().read_metadata(os.path.dirname(filepath), os.path.basename(filepath))
+            start_ts = pd.Timestamp(meta.start)
+            end_ts   = pd.Timestamp(meta.end)
+            duration = meta.duration
+            lat = float(meta.lat[0])
+            lon = float(meta.lon[0])
         except KeyError as e:
             messagebox.showerror("Errore metadati H5", f"Dataset mancante: {e}")
             return
@@ -174,7 +184,7 @@ class App:
         self.details_win.title("Dettagli file H5")
         self.details_win.transient(self.root)      
         self.details_win.grab_set()                
-        center_window(self.details_win, 500, 300)
+        center_window(self.details_win, 500, 330)
 
         frm = ttk.Frame(self.details_win, padding=10)
         frm.pack(fill='both', expand=True)
@@ -184,6 +194,7 @@ class App:
         ttk.Label(frm, text=f"Inizio: {start_ts}").pack(anchor='w', pady=2)
         ttk.Label(frm, text=f"Fine:   {end_ts}").pack(anchor='w', pady=2)
         ttk.Label(frm, text=f"Lat/Lon: {lat:.4f}, {lon:.4f}").pack(anchor='w', pady=2)
+        ttk.Label(frm, text=f"Segmenti burst: {meta.segment_count}").pack(anchor='w', pady=2)
         ttk.Label(frm, text=f"Luogo: {location_str}").pack(anchor='w', pady=2)
 
         btn_frame = ttk.Frame(frm)
@@ -309,11 +320,12 @@ class App:
         prev_filepath = getattr(self, '_prev_selected_filepath', None)
 
         # Carica dati VLF
-        reader = EFD()
-        vlf    = reader.read(os.path.dirname(filepath), os.path.basename(filepath))
+        # Legge solo il primo segmento: le pagine vengono poi generate un segmento alla volta
+        reader = EFD(sidecar=True, sidecar_folder=SIDECAR_FOLDER)
+        data0  = next(reader.iter_vlf_segments(os.path.dirname(filepath), os.path.basename(filepath)), None)
 
         # Se non ci sono burst -> rollback e avviso
-        if not vlf.split:
+        if data0 is None:
             self.selected_base     = prev_base
             self.selected_filepath = prev_filepath
             if prev_base:
@@ -337,9 +349,7 @@ class App:
         df['End_Time']   = pd.to_datetime(df['End_Time'])
 
         # Prepara detections globali
-        data0 = vlf.split[0]
-        data0['DateTime'] = pd.to_datetime(data0['DateTime'])
-        self.t0_global = data0['DateTime'].min()
+        self.t0_global = pd.Timestamp(data0.t0)
         self.dets_global = [
             [
                 (r['Start_Time'] - self.t0_global).total_seconds(),
@@ -352,7 +362,7 @@ class App:
         ]
 
         # Costruisci e mostra spettrogrammi
-        self.splits = vlf.split
+        self.h5_source = (os.path.dirname(filepath), os.path.basename(filepath))
         self.update_spec_pages()
         self.show_spec_page()
 
@@ -454,6 +464,13 @@ class App:
         )
         self.btn_gen.pack(side='left', padx=5)
 
+        self.btn_orbit = ttk.Button(
+            ctrl,
+            text='Orbita',
+            command=lambda: self.threaded_task(self.show_orbit_overview)
+        )
+        self.btn_orbit.pack(side='left', padx=5)
+
         tk.Label(ctrl, text='D0 ≥').pack(side='left', padx=(10,2))
         self.d0_entry = ttk.Entry(ctrl, width=5)
         self.d0_entry.pack(side='left')
@@ -564,15 +581,13 @@ class App:
 
         # leggi metadati
         try:
-            with h5py.File(filepath, 'r') as f:
-                utc_raw  = f['UTC_TIME'][:].flatten()
-                utc_strs = [f"{int(x):017d}" for x in utc_raw]
-                times    = pd.to_datetime(utc_strs, format='%Y%m%d%H%M%S%f')
-                start_ts = times[0]
-                end_ts   = times[-1]
-                duration = (end_ts - start_ts).total_seconds()
-                lat = float(np.array(f['GEO_LAT'])[:].flatten()[0])
-                lon = float(np.array(f['GEO_LON'])[:].flatten()[0])
+            # solo dataset 1-D: nessun segnale viene letto
+            meta     = EFD().read_metadata(os.path.dirname(filepath), os.path.basename(filepath))
+            start_ts = pd.Timestamp(meta.start)
+            end_ts   = pd.Timestamp(meta.end)
+            duration = meta.duration
+            lat = float(meta.lat[0])
+            lon = float(meta.lon[0])
         except Exception as e:
             self.details_text.insert('1.0', f"Errore lettura H5: {e}")
             return
@@ -606,6 +621,7 @@ class App:
             f"Inizio:    {start_ts}",
             f"Fine:      {end_ts}",
             f"Lat/Lon:   {lat:.4f}, {lon:.4f}",
+            f"Burst:     {meta.segment_count} segmenti",
             f"Luogo:     {location_str}",
             ""
         ]
@@ -639,11 +655,12 @@ class App:
         self.current_pkl     = os.path.join(PKL_FOLDER, base + '.pkl')
 
         # Carica con EFD
-        reader = EFD()
-        vlf    = reader.read(dirpath, h5_name)
+        # Legge solo il primo segmento: le pagine vengono poi generate un segmento alla volta
+        reader = EFD(sidecar=True, sidecar_folder=SIDECAR_FOLDER)
+        data0  = next(reader.iter_vlf_segments(dirpath, h5_name), None)
 
-        # Se split è None o lista vuota -> rollback e avviso
-        if not vlf.split:
+        # Se non ci sono segmenti burst -> rollback e avviso
+        if data0 is None:
             # rollback della selezione
             prev_base = getattr(self, '_prev_selected_base', None)
             prev_fp   = getattr(self, '_prev_selected_filepath', None)
@@ -670,9 +687,7 @@ class App:
         df['End_Time']   = pd.to_datetime(df['End_Time'])
 
         # Prepara detections globali
-        data0 = vlf.split[0]
-        data0['DateTime'] = pd.to_datetime(data0['DateTime'])
-        self.t0_global = data0['DateTime'].min()
+        self.t0_global = pd.Timestamp(data0.t0)
         self.dets_global = [
             [
                 (r['Start_Time'] - self.t0_global).total_seconds(),
@@ -685,7 +700,7 @@ class App:
         ]
 
         # Popola le pagine di spettrogramma
-        self.splits = vlf.split
+        self.h5_source = (dirpath, h5_name)
         self.update_spec_pages()
         self.show_spec_page()
 
@@ -699,35 +714,62 @@ class App:
         self.notebook.select(self.spec_tab)
 
 
+    def iter_blocks(self, first=0):
+        """
+        Segmenti burst del file caricato, letti uno alla volta dal file H5.
+        """
+        if not self.h5_source:
+            return iter(())
+        return EFD(sidecar=True, sidecar_folder=SIDECAR_FOLDER).iter_vlf_segments(*self.h5_source, first=first)
+
+
     def update_spec_pages(self):
-        spectra = Spectra()
+        spectra = Spectra(cache=SPEC_CACHE, fft=SPEC_FFT)
         self.spec_pages = []
-        for idx, block in enumerate(self.splits):
-            block['DateTime'] = pd.to_datetime(block['DateTime'])
-            sig = np.asarray(list(chain.from_iterable(block.Signal.values)))
-            freq = block.Frequency.values[0]
-            freqs, times, spec = spectra.spectrogram(sig, freq)
-            times *= 2
-            blk_start = (block['DateTime'].min() - self.t0_global).total_seconds()
-            blk_end   = blk_start + PAGE_SIZE_SECONDS
-            dets_blk = [
-                [d[0]-blk_start, d[1]-blk_start, d[2], d[3], d[4]]
-                for d in self.dets_global
-                if d[0] >= blk_start and d[1] <= blk_end and d[4] >= self.d0_threshold
-            ]
-            plotter = SpectrogramPlot()
-            fig_sz = plotter.calculate_figure_size(
-                spectra.get_time_freq_ratio(times, freqs)
-            )
-            fname = os.path.join(self.current_fig_dir, f'spectrogram_page_{idx}.png')
-            plotter.plot(
-                spec, times, freqs,
-                figsize=fig_sz,
-                detections=dets_blk,
-                save=True,
-                file_name=fname
-            )
-            self.spec_pages.append(fname)
+        if not self.h5_source:
+            return
+        # chiavi di cache dagli istanti dei blocchi, senza leggere il segnale
+        headers = list(EFD(sidecar=True, sidecar_folder=SIDECAR_FOLDER).iter_segment_headers(*self.h5_source))
+        for first in range(0, len(headers), SPEC_BATCH_BLOCKS):
+            group = headers[first:first + SPEC_BATCH_BLOCKS]
+            keys = [SpectrogramCache.segment_key(*self.h5_source, block) for block in group]
+            cached = [spectra.cached_spectrogram(key, block.fs) for key, block in zip(keys, group)]
+            if all(entry is not None for entry in cached):
+                freqs, spectrograms = cached[0][0], [(times, spec) for _, times, spec in cached]
+            else:
+                # una STFT per gruppo di blocchi, solo quelli non in cache vengono calcolati
+                blocks = list(islice(self.iter_blocks(first), len(group)))
+                freqs, spectrograms = spectra.spectrogram_batch([block.signal for block in blocks], blocks[0].fs,
+                                                                keys=keys)
+            for idx, (block, (times, spec)) in enumerate(zip(group, spectrograms), start=first):
+                self.save_spec_page(spectra, idx, block, freqs, times, spec)
+
+
+    def save_spec_page(self, spectra, idx, block, freqs, times, spec):
+        """
+        Salva l'immagine della pagina idx: spettrogramma del blocco con le detections sopra la soglia D0.
+        """
+        times = times * 2
+        blk_start = (pd.Timestamp(block.t0) - self.t0_global).total_seconds()
+        blk_end   = blk_start + PAGE_SIZE_SECONDS
+        dets_blk = [
+            [d[0]-blk_start, d[1]-blk_start, d[2], d[3], d[4]]
+            for d in self.dets_global
+            if d[0] >= blk_start and d[1] <= blk_end and d[4] >= self.d0_threshold
+        ]
+        plotter = SpectrogramPlot()
+        fig_sz = plotter.calculate_figure_size(
+            spectra.get_time_freq_ratio(times, freqs)
+        )
+        fname = os.path.join(self.current_fig_dir, f'spectrogram_page_{idx}.png')
+        plotter.plot(
+            spec, times, freqs,
+            figsize=fig_sz,
+            detections=dets_blk,
+            save=True,
+            file_name=fname
+        )
+        self.spec_pages.append(fname)
 
 
     def show_spec_page(self):
@@ -757,6 +799,42 @@ class App:
         )
 
 
+    def show_orbit_overview(self):
+        """
+        Panoramica dell'intera orbita dalla piramide multi-risoluzione del file (creata alla prima richiesta):
+        si legge solo il livello con al più una colonna per pixel della finestra.
+        """
+        if not self.h5_source:
+            return
+        source = os.path.join(*self.h5_source)
+        pyramid = os.path.join(PKL_FOLDER, os.path.splitext(self.h5_source[1])[0] + '.pyramid.h5')
+        spectra = Spectra(cache=SPEC_CACHE, fft=SPEC_FFT)
+        if not Spectra.pyramid_is_current(pyramid, source):
+            spectra.write_pyramid(self.iter_blocks(), pyramid, source_path=source,
+                                  segment_key=lambda block: SpectrogramCache.segment_key(*self.h5_source, block))
+        width = max(self.spec_c.winfo_width(), MIN_DET_WIDTH)
+        freqs, times, tile, level = spectra.pyramid_tile(pyramid, width=width)
+
+        # una colonna della piramide per pixel, frequenze basse in basso
+        finite = tile[np.isfinite(tile)]
+        low, high = np.percentile(finite, [1, 99]) if finite.size else (0, 1)
+        norm = np.clip((tile[::-1] - low) / max(high - low, 1e-12), 0, 1)
+        rgb = (plt.get_cmap('jet')(norm)[..., :3] * 255).astype(np.uint8)
+        img = Image.fromarray(rgb).resize((width, OVERVIEW_HEIGHT), Image.NEAREST)
+
+        for w in self.spec_frame.winfo_children():
+            w.destroy()
+        photo = ImageTk.PhotoImage(img)
+        lbl = tk.Label(self.spec_frame, image=photo)
+        lbl.image = photo
+        lbl.pack()
+        self.spec_c.update_idletasks()
+        self.spec_c.config(scrollregion=self.spec_c.bbox('all'))
+        self.spec_counter.config(
+            text=f'Orbita {pd.Timestamp(times[0]):%H:%M:%S} - {pd.Timestamp(times[-1]):%H:%M:%S} (livello {level})'
+        )
+
+
     def prev_spec_page(self):
         if self.page_index > 0:
             self.page_index -= 1
@@ -801,14 +879,12 @@ class App:
         try:
             self._clear_detections_dir()
             self._clear_detections_frame()
-            block = self.splits[self.page_index]
-            block['DateTime'] = pd.to_datetime(block['DateTime'])
-            sig = np.asarray(list(chain.from_iterable(block.Signal.values)))
-            freq = block.Frequency.values[0]
-            spec_reader = Spectra()
-            freqs, times, spec = spec_reader.spectrogram(sig, freq)
-            times *= 2
-            blk_start = (block['DateTime'].min() - self.t0_global).total_seconds()
+            block = next(self.iter_blocks(self.page_index))
+            spec_reader = Spectra(cache=SPEC_CACHE, fft=SPEC_FFT)
+            freqs, times, spec = spec_reader.spectrogram(
+                block.signal, block.fs, key=SpectrogramCache.segment_key(*self.h5_source, block))
+            times = times * 2
+            blk_start = (pd.Timestamp(block.t0) - self.t0_global).total_seconds()
             dets_blk = [
                 [d[0]-blk_start, d[1]-blk_start, d[2], d[3], d[4]]
                 for d in self.dets_global
@@ -816,7 +892,7 @@ class App:
             ]
             t_res = spec_reader.get_time_res(times)
             f_res = spec_reader.get_freq_res(freqs)
-            low_f, high_f, fn, d0, d0min, d0max = awds_util.get_value_base_on_l(block.L.values[0])
+            low_f, high_f, fn, d0, d0min, d0max = awds_util.get_value_base_on_l(block.L)
             viz = WhistlerDetectionVisualizer(
                 plot_obj=SpectrogramPlot(),
                 padding_factor=0.3,